@@ -2,17 +2,29 @@ import sys
 import cv2
 import numpy as np
 import json
-import tensorflow as tf
-import mediapipe as mp
+import os
+import time
+from contextlib import nullcontext
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                            QHBoxLayout, QPushButton, QLabel, QFrame)
+                            QHBoxLayout, QPushButton, QLabel, QFrame, QShortcut)
 from PyQt5.QtCore import QTimer, Qt
-from PyQt5.QtGui import QImage, QPixmap, QPainter, QIcon, QFont, QColor
+from PyQt5.QtGui import QImage, QPixmap, QPainter, QIcon, QFont, QColor, QKeySequence
+
+from inference_client import DaemonConnection, draw_hand
+from presence_gate import PresenceGate
+from quality_gate import QualityGate, handedness_score
+from perf_hud import PerfMonitor
+
+try:
+    from webrtc_peer import RemotePeer
+except ImportError:  # aiortc not installed: the remote pane mirrors the local feed
+    RemotePeer = None
 
 class VideoWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.image = QImage()
+        self.perf = None
         self.setMinimumSize(640, 480)
         
     def set_image(self, image):
@@ -20,6 +32,10 @@ class VideoWidget(QWidget):
         self.update()
         
     def paintEvent(self, event):
+        with self.perf.stage('paint') if self.perf else nullcontext():
+            self.paint_image()
+    
+    def paint_image(self):
         painter = QPainter(self)
         if not self.image.isNull():
             # Scale image to fit widget while maintaining aspect ratio
@@ -52,6 +68,10 @@ class BeAbledApp(QMainWindow):
         self.asl_enabled = False
         self.call_active = False
         self.current_gesture = ""
+        self.perf = PerfMonitor()
+        self.peer = None
+        # Hand detection only runs while there is motion in front of the camera
+        self.presence_gate = PresenceGate()
         
         # Initialize UI
         self.init_ui()
@@ -64,6 +84,10 @@ class BeAbledApp(QMainWindow):
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_frame)
         
+        # F3 toggles the performance HUD, F4 records a short frame-loop profile
+        QShortcut(QKeySequence("F3"), self, self.perf.toggle)
+        QShortcut(QKeySequence("F4"), self, self.record_profile)
+        
     def init_ui(self):
         """Initialize the Google Meet-style interface"""
         self.central_widget = QWidget()
@@ -83,6 +107,7 @@ class BeAbledApp(QMainWindow):
         
         # Remote video (main display)
         self.remote_video = VideoWidget()
+        self.remote_video.perf = self.perf
         self.remote_video.setStyleSheet("background-color: #202124;")
         
         # Local video (thumbnail)
@@ -231,23 +256,33 @@ class BeAbledApp(QMainWindow):
     
     def init_asl_detector(self):
         """Initialize the ASL detection model"""
-        try:
-            self.model = tf.keras.models.load_model('gesture_mobilenet_advanced2.h5')
-            with open('class_indices.json') as f:
-                self.class_indices = json.load(f)
-            self.idx_to_class = {v: k for k, v in self.class_indices.items()}
-            
-            self.mp_hands = mp.solutions.hands
-            self.hands = self.mp_hands.Hands(
-                max_num_hands=1,
-                min_detection_confidence=0.7,
-                min_tracking_confidence=0.5
-            )
-            self.mp_draw = mp.solutions.drawing_utils
-            self.img_size = (160, 160)
-        except Exception as e:
-            print(f"Error loading ASL model: {e}")
-            self.asl_btn.setEnabled(False)
+        self.daemon = DaemonConnection(self.load_in_process, on_unavailable=self.asl_unavailable)
+    
+    def load_in_process(self):
+        """Load the model and MediaPipe into this process"""
+        import tensorflow as tf
+        import mediapipe as mp
+        
+        self.model = tf.keras.models.load_model('gesture_mobilenet_advanced2.h5')
+        with open('class_indices.json') as f:
+            self.class_indices = json.load(f)
+        self.idx_to_class = {v: k for k, v in self.class_indices.items()}
+        
+        self.mp_hands = mp.solutions.hands
+        self.hands = self.mp_hands.Hands(
+            max_num_hands=1,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.5
+        )
+        self.mp_draw = mp.solutions.drawing_utils
+        self.img_size = (160, 160)
+        self.quality_gate = QualityGate()
+    
+    def asl_unavailable(self, error):
+        """Neither the daemon nor in-process models are usable: turn ASL off"""
+        print(f"Error loading ASL model: {error}")
+        self.asl_btn.setChecked(False)
+        self.asl_btn.setEnabled(False)
     
     def toggle_asl(self, checked):
         """Toggle ASL detection on/off"""
@@ -255,43 +290,93 @@ class BeAbledApp(QMainWindow):
         self.asl_panel.setVisible(checked)
         if not checked:
             self.asl_panel.setText("ASL detection off")
+        if self.peer is not None:
+            self.peer.asl_enabled = checked
     
     def toggle_call(self):
         """Start/end the video call"""
         if self.call_active:
             self.timer.stop()
+            self.hang_up()
             self.call_btn.setText("Join")
             self.asl_panel.setText("Call ended")
+            self.setWindowTitle("BeAbled Video Call")
             self.call_active = False
         else:
+            if RemotePeer is not None:
+                # Joins BEABLED_ROOM if set, otherwise creates a room for the other side to join
+                self.peer = RemotePeer(room_id=os.environ.get('BEABLED_ROOM')).start()
+                self.peer.asl_enabled = self.asl_enabled
             self.timer.start(30)  # ~30fps
             self.call_btn.setText("Leave")
             self.call_active = True
+            self.perf.reset()
+    
+    def hang_up(self):
+        """Close the WebRTC peer, if any"""
+        if self.peer is not None:
+            print(f"WebRTC: {self.peer.stats}")
+            self.peer.close()
+            self.peer = None
+    
+    def update_remote(self):
+        """Show the newest decoded remote frame; returns False if there is no remote peer"""
+        if self.peer is None:
+            return False
+        if self.peer.error:
+            print(f"WebRTC unavailable ({self.peer.error}), mirroring local video")
+            self.hang_up()
+            return False
+        if self.peer.ready.is_set():
+            self.setWindowTitle(f"BeAbled Video Call - room {self.peer.room_id} ({self.peer.state})")
+        remote = self.peer.latest()
+        if remote is not None:
+            rgb_image, _ = remote
+            h, w, ch = rgb_image.shape
+            self.remote_video.set_image(QImage(rgb_image.data, w, h, ch * w, QImage.Format_RGB888))
+        return True
+    
+    def record_profile(self):
+        """Record a sampled profile of the frame loop for bug reports"""
+        path = self.perf.record_profile()
+        if path:
+            self.asl_panel.setVisible(True)
+            self.asl_panel.setText(f"Recording profile to {path}")
     
     def update_frame(self):
         """Process each video frame"""
-        ret, frame = self.capture.read()
+        perf = self.perf
+        perf.frame()
+        with perf.stage('capture'):
+            ret, frame = self.capture.read()
         if not ret:
+            perf.drop()
             return
             
         # Mirror the frame for more natural view
         frame = cv2.flip(frame, 1)
+        if self.peer is not None:
+            self.peer.send(frame.copy())  # ASL and the HUD draw on frame below
         
         # Process ASL if enabled
         if self.asl_enabled:
             frame = self.process_asl(frame)
         
+        perf.draw(frame)
+        
         # Convert to QImage
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
+        with perf.stage('convert'):
+            rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            h, w, ch = rgb_image.shape
+            bytes_per_line = ch * w
+            qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
         
         # Update displays
         self.local_video.set_image(qt_image)
         
-        # For demo purposes, mirror local video as remote
-        self.remote_video.set_image(qt_image)
+        # Without a WebRTC peer, mirror local video as remote
+        if not self.update_remote():
+            self.remote_video.set_image(qt_image)
         
         # Update local video overlay position
         self.local_video_overlay.setGeometry(
@@ -300,13 +385,49 @@ class BeAbledApp(QMainWindow):
             240, 135
         )
     
+    def process_asl_remote(self, frame):
+        """Process frame for ASL detection through the inference daemon"""
+        t0 = time.perf_counter()
+        with self.perf.stage('daemon'):
+            hands = self.daemon.process_frame(frame)
+        if hands is None:
+            return frame
+        self.presence_gate.record_detection(time.perf_counter() - t0)  # includes the daemon's classify
+        if hands:
+            self.presence_gate.keep_awake()
+        
+        for hand in hands:
+            x_min, y_min, x_max, y_max = hand['bbox']
+            if hand['rejected']:
+                cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 0, 255), 2)
+                continue
+            self.perf.inference()
+            if hand['label']:
+                self.current_gesture = hand['label']
+                self.asl_panel.setText(f"✋ {self.current_gesture} ({hand['confidence']:.1%})")
+            draw_hand(frame, hand['landmarks'], color=(121, 44, 250))
+            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
+        
+        return frame
+    
     def process_asl(self, frame):
         """Process frame for ASL detection"""
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(image_rgb)
+        with self.perf.stage('presence'):
+            active = self.presence_gate.active(frame)
+        if not active or not self.daemon.available:
+            return frame
+        if self.daemon.remote:
+            return self.process_asl_remote(frame)
+        
+        t0 = time.perf_counter()
+        with self.perf.stage('mediapipe'):
+            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            results = self.hands.process(image_rgb)
+        self.presence_gate.record_detection(time.perf_counter() - t0)
         
         if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
+            self.presence_gate.keep_awake()
+            for i, hand_landmarks in enumerate(results.multi_hand_landmarks):
                 # Get hand bounding box
                 h, w, _ = frame.shape
                 x_min = int(min([lm.x for lm in hand_landmarks.landmark]) * w) - 20
@@ -323,13 +444,20 @@ class BeAbledApp(QMainWindow):
                 if cropped_hand.size == 0:
                     continue
                 
+                # Skip the classifier for blurry, tiny or cut-off hands
+                if self.quality_gate.check(cropped_hand, hand_landmarks, handedness_score(results, i)):
+                    cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 0, 255), 2)
+                    continue
+                
                 # Prepare image for model
                 img = cv2.resize(cropped_hand, self.img_size)
                 img = img / 255.0
                 img = np.expand_dims(img, axis=0)
                 
                 # Predict gesture
-                preds = self.model.predict(img, verbose=0)
+                with self.perf.stage('keras'):
+                    preds = self.model.predict(img, verbose=0)
+                self.perf.inference()
                 class_idx = np.argmax(preds)
                 confidence = preds[0][class_idx]
                 
@@ -353,6 +481,12 @@ class BeAbledApp(QMainWindow):
     def closeEvent(self, event):
         """Clean up resources when closing"""
         self.capture.release()
+        self.hang_up()
+        print(f"Presence gate: {self.presence_gate.stats()}")
+        if self.daemon.remote:
+            self.daemon.close()
+        elif self.daemon.available:
+            print(f"Quality gate: {self.quality_gate.stats()}")
         event.accept()
 
 if __name__ == "__main__":
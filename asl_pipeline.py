@@ -0,0 +1,82 @@
+import json
+import cv2
+import numpy as np
+import tensorflow as tf
+import mediapipe as mp
+
+from quality_gate import QualityGate, handedness_score
+from enrollment import EnrolledClassifier
+
+MODEL_PATH = 'gesture_mobilenet_advanced2.h5'
+LABELS_PATH = 'class_indices.json'
+IMG_SIZE = (160, 160)
+CONFIDENCE_THRESHOLD = 0.7
+
+
+def load_model(model_path=MODEL_PATH, labels_path=LABELS_PATH):
+    """Load the Keras gesture model and its index -> label map"""
+    model = tf.keras.models.load_model(model_path)
+    with open(labels_path) as f:
+        class_indices = json.load(f)
+    idx_to_class = {v: k for k, v in class_indices.items()}
+    return model, idx_to_class
+
+
+def hand_bbox(hand_landmarks, w, h, margin=20):
+    """Pixel bounding box around the landmarks, clamped to the frame"""
+    xs = [lm.x for lm in hand_landmarks.landmark]
+    ys = [lm.y for lm in hand_landmarks.landmark]
+    x_min = max(int(min(xs) * w) - margin, 0)
+    y_min = max(int(min(ys) * h) - margin, 0)
+    x_max = min(int(max(xs) * w) + margin, w)
+    y_max = min(int(max(ys) * h) + margin, h)
+    return x_min, y_min, x_max, y_max
+
+
+def prepare_crop(cropped_hand, img_size=IMG_SIZE):
+    """Resize and normalise a BGR crop the same way cnn2.py trains"""
+    img = cv2.resize(cropped_hand, img_size)
+    return img / 255.0
+
+
+class HeadlessASL:
+    """ASL recognition without any drawing, for batch and server use.
+
+    With `enrollments` (an enrollment.EmbeddingIndex) the user's enrolled
+    signs are matched alongside the softmax head.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, labels_path=LABELS_PATH,
+                 static_image_mode=False, quality_gate=None, enrollments=None):
+        self.model, self.idx_to_class = load_model(model_path, labels_path)
+        self.img_size = tuple(self.model.input_shape[1:3])
+        self.classifier = EnrolledClassifier(self.model, self.idx_to_class, enrollments, CONFIDENCE_THRESHOLD)
+        self.hands = mp.solutions.hands.Hands(
+            static_image_mode=static_image_mode,
+            max_num_hands=1,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+        self.quality_gate = quality_gate or QualityGate()
+
+    def process_frame(self, frame):
+        """Return (label, confidence) for a BGR frame; label is None if nothing confident"""
+        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        result = self.hands.process(image_rgb)
+        if not result.multi_hand_landmarks:
+            return None, 0.0
+
+        h, w, _ = frame.shape
+        hand_landmarks = result.multi_hand_landmarks[0]
+        x_min, y_min, x_max, y_max = hand_bbox(hand_landmarks, w, h)
+        cropped_hand = frame[y_min:y_max, x_min:x_max]
+        if cropped_hand.size == 0:
+            return None, 0.0
+        if self.quality_gate.check(cropped_hand, hand_landmarks, handedness_score(result, 0)):
+            return None, 0.0
+
+        batch = np.expand_dims(prepare_crop(cropped_hand, self.img_size), axis=0)
+        return self.classifier.classify(batch)
+
+    def close(self):
+        self.hands.close()
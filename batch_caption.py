@@ -0,0 +1,261 @@
+"""Headless batch transcription of recorded videos into caption files.
+
+Usage:
+    python batch_caption.py session1.mp4 session2.mp4 --out captions --workers 4
+
+Each video is split into fixed-length chunks that are processed by a pool of
+worker processes (every worker owns its own MediaPipe Hands graph and Keras
+model). Finished chunks are stored under <out>/<video>.parts/ so an
+interrupted run picks up where it left off; a part made with a different
+chunk length, stride or model is redone rather than reused. Once every chunk of a video is
+done the per-frame labels are merged into SRT, VTT and JSON timelines.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from collections import defaultdict
+
+import cv2
+
+from asl_pipeline import HeadlessASL, MODEL_PATH, LABELS_PATH
+
+_detector = None
+
+
+def _init_worker(model_path, labels_path):
+    global _detector
+    _detector = HeadlessASL(model_path, labels_path)
+
+
+def _process_chunk(task):
+    video_path, start, end, stride, part_path, key = task
+    t0 = time.perf_counter()
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    samples = []
+    frames = 0
+    # The last chunk has no end and reads to EOF, container frame counts can be off
+    for frame_idx in (itertools.count(start) if end is None else range(start, end)):
+        if frame_idx % stride:
+            if not cap.grab():
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        label, confidence = _detector.process_frame(frame)
+        samples.append([frame_idx, label, round(confidence, 4)])
+        frames += 1
+    cap.release()
+
+    elapsed = time.perf_counter() - t0
+    part = dict(key, start=start, samples=samples)
+    tmp_path = part_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(part, f)
+    os.replace(tmp_path, part_path)  # a chunk only counts as done once fully written
+    return {'pid': os.getpid(), 'frames': frames, 'seconds': elapsed,
+            'gate': _detector.quality_gate.stats()}
+
+
+def _video_info(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, frame_count
+
+
+def _chunk_key(end, stride, model_path, labels_path):
+    """Everything a finished chunk depends on besides its start frame"""
+    return {'end': end, 'stride': stride,
+            'model': os.path.abspath(model_path), 'labels': os.path.abspath(labels_path)}
+
+
+def _chunk_done(part_path, key):
+    """A part file only counts if it was made with the same chunking, stride and model"""
+    if not os.path.exists(part_path):
+        return False
+    try:
+        with open(part_path) as f:
+            part = json.load(f)
+    except ValueError:
+        return False
+    return all(part.get(name) == value for name, value in key.items())
+
+
+def build_segments(samples, fps, stride, max_gap=0.5, min_duration=0.3):
+    """Merge per-frame labels into (start, end, label, confidence) segments"""
+    frame_span = stride / fps
+    segments = []
+    for frame_idx, label, confidence in samples:
+        if label is None:
+            continue
+        t = frame_idx / fps
+        last = segments[-1] if segments else None
+        if last and last['label'] == label and t - last['end'] <= max_gap:
+            last['end'] = t + frame_span
+            last['scores'].append(confidence)
+        else:
+            segments.append({'start': t, 'end': t + frame_span,
+                             'label': label, 'scores': [confidence]})
+
+    timeline = []
+    for seg in segments:
+        if seg['end'] - seg['start'] < min_duration:
+            continue
+        timeline.append({
+            'start': round(seg['start'], 3),
+            'end': round(seg['end'], 3),
+            'label': seg['label'],
+            'confidence': round(sum(seg['scores']) / len(seg['scores']), 4)
+        })
+    return timeline
+
+
+def _timestamp(seconds, sep):
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+
+def write_srt(timeline, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, seg in enumerate(timeline, 1):
+            f.write(f"{i}\n{_timestamp(seg['start'], ',')} --> {_timestamp(seg['end'], ',')}\n"
+                    f"{seg['label']}\n\n")
+
+
+def write_vtt(timeline, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\n\n")
+        for seg in timeline:
+            f.write(f"{_timestamp(seg['start'], '.')} --> {_timestamp(seg['end'], '.')}\n"
+                    f"{seg['label']}\n\n")
+
+
+def plan_video(video_path, out_dir, chunk_seconds, stride, model_path=MODEL_PATH, labels_path=LABELS_PATH):
+    fps, frame_count = _video_info(video_path)
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    # Same-named videos from different directories must not share resume parts
+    path_hash = hashlib.sha1(os.path.abspath(video_path).encode()).hexdigest()[:10]
+    parts_dir = os.path.join(out_dir, f"{stem}.{path_hash}.parts")
+    os.makedirs(parts_dir, exist_ok=True)
+    if frame_count <= 0:
+        print(f"⚠️ {video_path}: frame count unknown, captioning it in one sequential pass")
+
+    chunk_frames = max(int(chunk_seconds * fps), stride)
+    starts = list(range(0, frame_count, chunk_frames)) or [0]
+    tasks, pending = [], []
+    for start in starts:
+        end = start + chunk_frames if start != starts[-1] else None
+        part_path = os.path.join(parts_dir, f"chunk_{start:09d}.json")
+        key = _chunk_key(end, stride, model_path, labels_path)
+        task = (video_path, start, end, stride, part_path, key)
+        tasks.append(task)
+        if not _chunk_done(part_path, key):
+            pending.append(task)
+    return {'path': video_path, 'stem': stem, 'path_hash': path_hash, 'fps': fps,
+            'frame_count': frame_count, 'tasks': tasks, 'pending': pending}
+
+
+def merge_video(plan, out_dir, formats, max_gap, min_duration, stride):
+    samples = []
+    for task in plan['tasks']:
+        with open(task[4]) as f:
+            samples.extend(json.load(f)['samples'])
+    samples.sort(key=lambda s: s[0])
+
+    timeline = build_segments(samples, plan['fps'], stride, max_gap, min_duration)
+    base = os.path.join(out_dir, plan['stem'])
+    if 'srt' in formats:
+        write_srt(timeline, base + '.srt')
+    if 'vtt' in formats:
+        write_vtt(timeline, base + '.vtt')
+    if 'json' in formats:
+        with open(base + '.json', 'w') as f:
+            json.dump({'video': plan['path'], 'fps': plan['fps'],
+                       'frames': plan['frame_count'], 'stride': stride,
+                       'captions': timeline}, f, indent=2)
+    return timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caption recorded videos with the ASL model")
+    parser.add_argument('videos', nargs='+')
+    parser.add_argument('--out', default='captions')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-seconds', type=float, default=30.0)
+    parser.add_argument('--stride', type=int, default=1, help="classify every Nth frame")
+    parser.add_argument('--max-gap', type=float, default=0.5,
+                        help="seconds of no-sign tolerated inside one caption")
+    parser.add_argument('--min-duration', type=float, default=0.3)
+    parser.add_argument('--formats', default='srt,vtt,json')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--labels', default=LABELS_PATH)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    formats = set(args.formats.split(','))
+    plans = [plan_video(v, args.out, args.chunk_seconds, args.stride, args.model, args.labels)
+             for v in args.videos]
+    stems = [plan['stem'] for plan in plans]
+    for plan in plans:
+        if stems.count(plan['stem']) > 1:  # keep caption files of same-named videos apart too
+            plan['stem'] = f"{plan['stem']}.{plan['path_hash']}"
+    pending = [task for plan in plans for task in plan['pending']]
+    total = sum(len(plan['tasks']) for plan in plans)
+    print(f"📼 {len(plans)} video(s), {total} chunks, {total - len(pending)} already done")
+
+    per_worker = defaultdict(lambda: {'frames': 0, 'seconds': 0.0, 'gate': {}})
+    wall_start = time.perf_counter()
+    if pending:
+        # spawn: TensorFlow and MediaPipe are not fork-safe
+        ctx = mp.get_context('spawn')
+        with ctx.Pool(args.workers, initializer=_init_worker,
+                      initargs=(args.model, args.labels)) as pool:
+            for done, stats in enumerate(pool.imap_unordered(_process_chunk, pending), 1):
+                worker = per_worker[stats['pid']]
+                worker['frames'] += stats['frames']
+                worker['seconds'] += stats['seconds']
+                worker['gate'] = stats['gate']  # cumulative per worker, keep the latest
+                print(f"  [{done}/{len(pending)}] chunk done on pid {stats['pid']}: "
+                      f"{stats['frames']} frames in {stats['seconds']:.1f}s")
+    wall = time.perf_counter() - wall_start
+
+    for plan in plans:
+        timeline = merge_video(plan, args.out, formats, args.max_gap,
+                               args.min_duration, args.stride)
+        print(f"✅ {plan['path']}: {len(timeline)} captions")
+
+    if per_worker:
+        print("\nThroughput per core:")
+        for pid, worker in sorted(per_worker.items()):
+            fps = worker['frames'] / worker['seconds'] if worker['seconds'] else 0.0
+            print(f"  pid {pid}: {worker['frames']} frames, {fps:.1f} frames/s")
+        frames = sum(w['frames'] for w in per_worker.values())
+        print(f"  total: {frames} frames in {wall:.1f}s wall, "
+              f"{frames / wall:.1f} frames/s across {len(per_worker)} worker(s)")
+
+        gate = defaultdict(int)
+        for worker in per_worker.values():
+            for reason, count in worker['gate'].items():
+                if reason not in ('total', 'rejected_fraction'):
+                    gate[reason] += count
+        checked = sum(gate.values())
+        if checked:
+            print(f"Quality gate: {dict(gate)} "
+                  f"({1 - gate['passed'] / checked:.1%} of hand crops skipped the classifier)")
+
+
+if __name__ == "__main__":
+    main()
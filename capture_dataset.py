@@ -0,0 +1,240 @@
+"""Capture gesture samples into data/<class>/ in the existing Pascal VOC layout.
+
+Usage:
+    python capture_dataset.py thanks --count 500
+
+For every frame where MediaPipe finds a hand this writes
+    <label>.<uuid1>.jpg    the full camera frame
+    <label>.<uuid1>.xml    VOC annotation, bbox taken from the landmarks
+    <label>.<uuid1>.json   landmarks sidecar (normalised x, y, z + handedness)
+JPEG encoding and disk writes happen on a pool of writer threads fed by a
+bounded queue, and files are fsynced in batches, so the capture loop only
+runs the camera and MediaPipe. If the writers fall behind, samples are
+dropped (and counted) rather than stalling the camera.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import cv2
+import mediapipe as mp
+
+VOC_TEMPLATE = """<annotation>
+\t<folder>{folder}</folder>
+\t<filename>{filename}</filename>
+\t<path>{path}</path>
+\t<source>
+\t\t<database>Unknown</database>
+\t</source>
+\t<size>
+\t\t<width>{width}</width>
+\t\t<height>{height}</height>
+\t\t<depth>{depth}</depth>
+\t</size>
+\t<segmented>0</segmented>
+\t<object>
+\t\t<name>{label}</name>
+\t\t<pose>Unspecified</pose>
+\t\t<truncated>{truncated}</truncated>
+\t\t<difficult>0</difficult>
+\t\t<bndbox>
+\t\t\t<xmin>{xmin}</xmin>
+\t\t\t<ymin>{ymin}</ymin>
+\t\t\t<xmax>{xmax}</xmax>
+\t\t\t<ymax>{ymax}</ymax>
+\t\t</bndbox>
+\t</object>
+</annotation>
+"""
+
+
+def landmark_bbox(landmarks, w, h, margin=20):
+    """Pixel bbox around normalised landmarks, clamped to the frame; also reports truncation"""
+    xs = [lm[0] for lm in landmarks]
+    ys = [lm[1] for lm in landmarks]
+    truncated = min(xs) < 0 or min(ys) < 0 or max(xs) > 1 or max(ys) > 1
+    x_min = max(int(min(xs) * w) - margin, 0)
+    y_min = max(int(min(ys) * h) - margin, 0)
+    x_max = min(int(max(xs) * w) + margin, w)
+    y_max = min(int(max(ys) * h) + margin, h)
+    return (x_min, y_min, x_max, y_max), truncated
+
+
+class DatasetWriter:
+    """Background writer pool with batched fsyncs"""
+
+    def __init__(self, out_dir, label, workers=4, queue_size=256, fsync_batch=64, quality=95):
+        self.class_dir = os.path.join(out_dir, label)
+        os.makedirs(self.class_dir, exist_ok=True)
+        self.label = label
+        self.quality = quality
+        self.fsync_batch = fsync_batch
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.unsynced = []
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_error = None
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, frame, landmarks, handedness):
+        """Never blocks; returns False if the sample had to be dropped"""
+        try:
+            self.queue.put_nowait((frame, landmarks, handedness))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            try:
+                self._write(*item)
+            except Exception as e:  # e.g. a full disk; keep draining so close() can finish
+                with self.lock:
+                    self.failed += 1
+                    self.last_error = e
+            finally:
+                self.queue.task_done()
+
+    def _write(self, frame, landmarks, handedness):
+        h, w, depth = frame.shape
+        (x_min, y_min, x_max, y_max), truncated = landmark_bbox(landmarks, w, h)
+        stem = f"{self.label}.{uuid.uuid1()}"
+        jpg_path = os.path.join(self.class_dir, stem + '.jpg')
+
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        files = {
+            jpg_path: encoded.tobytes(),
+            os.path.join(self.class_dir, stem + '.xml'): VOC_TEMPLATE.format(
+                folder=self.label, filename=stem + '.jpg', path=os.path.abspath(jpg_path),
+                width=w, height=h, depth=depth, label=self.label, truncated=int(truncated),
+                xmin=x_min, ymin=y_min, xmax=x_max, ymax=y_max).encode(),
+            os.path.join(self.class_dir, stem + '.json'): json.dumps({
+                'image': stem + '.jpg', 'width': w, 'height': h,
+                'handedness': handedness, 'landmarks': landmarks}).encode(),
+        }
+        for path, payload in files.items():
+            with open(path, 'wb') as f:
+                f.write(payload)
+
+        with self.lock:
+            self.written += 1
+            self.unsynced.extend(files)
+            if len(self.unsynced) < self.fsync_batch * len(files):  # fsync_batch counts samples
+                return
+            batch, self.unsynced = self.unsynced, []
+        self._fsync(batch)
+
+    def _fsync(self, paths):
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        # One directory fsync per batch makes the new entries durable too
+        fd = os.open(self.class_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        for _ in self.threads:
+            # Only wait for room in the queue while some worker is left to drain it
+            while any(t.is_alive() for t in self.threads):
+                try:
+                    self.queue.put(None, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+        for t in self.threads:
+            t.join()
+        with self.lock:
+            batch, self.unsynced = self.unsynced, []
+        if batch:
+            self._fsync(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture gesture samples for training")
+    parser.add_argument('label')
+    parser.add_argument('--out', default='data')
+    parser.add_argument('--count', type=int, default=200, help="samples to capture")
+    parser.add_argument('--every', type=int, default=1, help="keep every Nth frame with a hand")
+    parser.add_argument('--camera', type=int, default=0)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--fsync-batch', type=int, default=64)
+    parser.add_argument('--quality', type=int, default=95)
+    parser.add_argument('--no-preview', action='store_true')
+    args = parser.parse_args()
+
+    writer = DatasetWriter(args.out, args.label, workers=args.writers,
+                           fsync_batch=args.fsync_batch, quality=args.quality)
+    hands = mp.solutions.hands.Hands(max_num_hands=1)
+    mp_draw = mp.solutions.drawing_utils
+    cap = cv2.VideoCapture(args.camera)
+
+    frames = hand_frames = queued = 0
+    start = time.perf_counter()
+    while queued < args.count:
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        frames += 1
+
+        result = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if result.multi_hand_landmarks:
+            hand_frames += 1
+            hand_landmarks = result.multi_hand_landmarks[0]
+            if hand_frames % args.every == 0:
+                landmarks = [[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark]
+                handedness = None
+                if result.multi_handedness:
+                    c = result.multi_handedness[0].classification[0]
+                    handedness = {'label': c.label, 'score': c.score}
+                if writer.submit(frame, landmarks, handedness):
+                    queued += 1
+
+        if not args.no_preview:
+            preview = frame.copy()  # the queued frame must stay unannotated
+            if result.multi_hand_landmarks:
+                mp_draw.draw_landmarks(preview, result.multi_hand_landmarks[0],
+                                       mp.solutions.hands.HAND_CONNECTIONS)
+            fps = frames / (time.perf_counter() - start)
+            cv2.putText(preview, f"{args.label}: {queued}/{args.count}  {fps:.1f} fps  "
+                                 f"dropped {writer.dropped}",
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.imshow('Dataset capture', preview)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+    capture_time = time.perf_counter() - start
+    cap.release()
+    cv2.destroyAllWindows()
+    writer.close()
+
+    print(f"✅ {writer.written} samples written to {writer.class_dir}")
+    if writer.failed:
+        print(f"⚠️ {writer.failed} samples failed to write, last error: {writer.last_error}")
+    print(f"   {frames} frames in {capture_time:.1f}s ({frames / capture_time:.1f} fps), "
+          f"{hand_frames} with a hand, {writer.dropped} dropped because writers were behind")
+
+
+if __name__ == "__main__":
+    main()
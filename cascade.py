@@ -0,0 +1,241 @@
+"""Two-tier recognition cascade: a low-resolution fast model first, the full
+model only when the fast one is unsure.
+
+The fast model is trained by cnn2.py at a smaller input size:
+    IMG_SIZE=96 MODEL_OUT=gesture_fast.h5 LABELS_OUT=class_indices_fast.json python cnn2.py
+
+For each crop the fast model's top-1 confidence and its margin over the
+runner-up decide what happens:
+    confidence >= high and margin >= min_margin   fast model's answer
+    confidence < low                              no sign, answered by the fast model
+    anything else (the uncertainty band)          escalate to the full model
+
+Evaluate a band against full-model-only on labelled crops:
+    python cascade.py --data processed_data --low 0.5 --high 0.9 --sweep
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+FAST_MODEL_PATH = 'gesture_fast.h5'
+FAST_LABELS_PATH = 'class_indices_fast.json'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def top2(probs):
+    """(class_idx, confidence, margin over the runner-up) for one softmax row"""
+    order = np.argsort(probs)
+    best, second = int(order[-1]), (probs[order[-2]] if len(probs) > 1 else 0.0)
+    return best, float(probs[best]), float(probs[best] - second)
+
+
+class Cascade:
+    """Wraps a fast model; the full model is passed per call so hot-swaps are respected.
+
+    `fast` needs .predict(batch), .input_size (height, width) and
+    .idx_to_class, which both ModelVersion and Classifier provide.
+    """
+
+    def __init__(self, fast, low=0.5, high=0.9, min_margin=0.2):
+        self.fast = fast
+        self.low = low
+        self.high = high
+        self.min_margin = min_margin
+        self.lock = threading.Lock()
+        self.counts = {'frames': 0, 'escalated': 0, 'no_sign': 0, 'fast_ms': 0.0, 'full_ms': 0.0}
+
+    def decide(self, confidence, margin):
+        """'fast', 'no_sign' or 'escalate'"""
+        if confidence < self.low:
+            return 'no_sign'
+        if confidence >= self.high and margin >= self.min_margin:
+            return 'fast'
+        return 'escalate'
+
+    def classify(self, cropped_hand, full):
+        """(label or None, confidence, escalated) for a BGR crop.
+
+        `full(cropped_hand)` runs the full model and returns (label, confidence),
+        or None if it gave up, in which case so does this.
+        """
+        t0 = time.perf_counter()
+        img = cv2.resize(cropped_hand, self.fast.input_size[::-1]) / 255.0
+        probs = self.fast.predict(np.expand_dims(img, axis=0))[0]
+        class_idx, confidence, margin = top2(probs)
+        t1 = time.perf_counter()
+        decision = self.decide(confidence, margin)
+
+        label = None
+        if decision == 'fast':
+            label = self.fast.idx_to_class.get(class_idx)
+        elif decision == 'escalate':
+            result = full(cropped_hand)
+            if result is None:
+                return None
+            label, confidence = result
+        t2 = time.perf_counter()
+
+        with self.lock:
+            self.counts['frames'] += 1
+            self.counts['escalated'] += decision == 'escalate'
+            self.counts['no_sign'] += decision == 'no_sign'
+            self.counts['fast_ms'] += (t1 - t0) * 1000
+            self.counts['full_ms'] += (t2 - t1) * 1000
+        return label, confidence, decision == 'escalate'
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        frames = counts['frames']
+        return {
+            'band': [self.low, self.high], 'min_margin': self.min_margin,
+            'frames': frames,
+            'escalation_rate': round(counts['escalated'] / frames, 3) if frames else None,
+            'no_sign_rate': round(counts['no_sign'] / frames, 3) if frames else None,
+            'fast_ms': round(counts['fast_ms'] / frames, 2) if frames else None,
+            'full_ms': round(counts['full_ms'] / counts['escalated'], 2) if counts['escalated'] else None,
+        }
+
+
+class Classifier:
+    """Keras model + label map with the interface Cascade expects"""
+
+    def __init__(self, model_path=FAST_MODEL_PATH, labels_path=FAST_LABELS_PATH):
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(model_path)
+        with open(labels_path) as f:
+            self.idx_to_class = {v: k for k, v in json.load(f).items()}
+        self.input_size = tuple(self.model.input_shape[1:3])
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+# Offline evaluation
+
+def list_crops(data_dir, split_manifest=None):
+    """[(path, label)] from <data_dir>/<class>/ or the validation rows of a split manifest"""
+    if split_manifest:
+        import csv
+        with open(split_manifest) as f:
+            return [(os.path.join(data_dir, r['filename']), r['class'])
+                    for r in csv.DictReader(f) if r['split'] == 'validation']
+    items = []
+    for label in sorted(os.listdir(data_dir)):
+        class_dir = os.path.join(data_dir, label)
+        if not os.path.isdir(class_dir) or label.startswith('.'):
+            continue
+        items += [(os.path.join(class_dir, name), label) for name in sorted(os.listdir(class_dir))
+                  if name.lower().endswith(IMAGE_EXTENSIONS)]
+    return items
+
+
+def predict_all(model, images, batch_size=64):
+    probs = []
+    for i in range(0, len(images), batch_size):
+        batch = np.stack([cv2.resize(img, model.input_size[::-1]) / 255.0
+                          for img in images[i:i + batch_size]])
+        probs.append(model.predict(batch))
+    return np.concatenate(probs)
+
+
+def single_latency_ms(model, image, runs=50):
+    batch = np.expand_dims(cv2.resize(image, model.input_size[::-1]) / 255.0, axis=0)
+    model.predict(batch)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        model.predict(batch)
+    return (time.perf_counter() - t0) / runs * 1000
+
+
+def labels_for(probs, idx_to_class, threshold):
+    idx = probs.argmax(axis=1)
+    conf = probs.max(axis=1)
+    return np.array([idx_to_class.get(int(i)) if c > threshold else None for i, c in zip(idx, conf)],
+                    dtype=object)
+
+
+def evaluate_band(fast_probs, fast_labels, full_labels, truth, low, high, min_margin):
+    cascade = Cascade(None, low, high, min_margin)
+    predicted, escalated = [], 0
+    for probs, fast_label, full_label in zip(fast_probs, fast_labels, full_labels):
+        _, confidence, margin = top2(probs)
+        decision = cascade.decide(confidence, margin)
+        escalated += decision == 'escalate'
+        predicted.append(full_label if decision == 'escalate' else
+                         fast_label if decision == 'fast' else None)
+    predicted = np.array(predicted, dtype=object)
+    return {
+        'band': [low, high], 'min_margin': min_margin,
+        'escalation_rate': escalated / len(truth),
+        'accuracy': float(np.mean(predicted == truth)),
+        'agreement_with_full': float(np.mean(predicted == full_labels)),
+    }
+
+
+def main():
+    from asl_pipeline import MODEL_PATH, LABELS_PATH, CONFIDENCE_THRESHOLD
+
+    parser = argparse.ArgumentParser(description="Compare the cascade with full-model-only recognition")
+    parser.add_argument('--data', default='processed_data', help="labelled hand crops, one folder per class")
+    parser.add_argument('--split-manifest', help="only evaluate the validation rows of dedup_dataset.py's split.csv")
+    parser.add_argument('--fast-model', default=FAST_MODEL_PATH)
+    parser.add_argument('--fast-labels', default=FAST_LABELS_PATH)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--labels', default=LABELS_PATH)
+    parser.add_argument('--low', type=float, default=0.5)
+    parser.add_argument('--high', type=float, default=0.9)
+    parser.add_argument('--min-margin', type=float, default=0.2)
+    parser.add_argument('--sweep', action='store_true', help="also try a grid of bands")
+    parser.add_argument('--out', help="write the report as JSON")
+    args = parser.parse_args()
+
+    items = list_crops(args.data, args.split_manifest)
+    images, truth = [], []
+    for path, label in items:
+        img = cv2.imread(path)
+        if img is not None:
+            images.append(img)
+            truth.append(label)
+    truth = np.array(truth, dtype=object)
+    print(f"🔍 Evaluating on {len(images)} crops")
+
+    fast = Classifier(args.fast_model, args.fast_labels)
+    full = Classifier(args.model, args.labels)
+    fast_probs = predict_all(fast, images)
+    fast_labels = labels_for(fast_probs, fast.idx_to_class, 0.0)  # fast answers are gated by the band
+    full_labels = labels_for(predict_all(full, images), full.idx_to_class, CONFIDENCE_THRESHOLD)
+    fast_ms = single_latency_ms(fast, images[0])
+    full_ms = single_latency_ms(full, images[0])
+
+    bands = [(args.low, args.high, args.min_margin)]
+    if args.sweep:
+        bands += [(low, high, args.min_margin) for low in (0.3, 0.5, 0.7)
+                  for high in (0.8, 0.9, 0.95, 0.99) if high > low]
+
+    report = {
+        'crops': len(images), 'fast_ms': round(fast_ms, 2), 'full_ms': round(full_ms, 2),
+        'full_only_accuracy': float(np.mean(full_labels == truth)), 'bands': [],
+    }
+    print(f"Full model only: accuracy {report['full_only_accuracy']:.3f}, {full_ms:.1f} ms/frame")
+    for low, high, min_margin in bands:
+        result = evaluate_band(fast_probs, fast_labels, full_labels, truth, low, high, min_margin)
+        result['expected_ms'] = round(fast_ms + result['escalation_rate'] * full_ms, 2)
+        report['bands'].append(result)
+        print(f"Cascade [{low:.2f}, {high:.2f}) margin {min_margin:.2f}: "
+              f"accuracy {result['accuracy']:.3f}, escalated {result['escalation_rate']:.1%}, "
+              f"agrees with full {result['agreement_with_full']:.1%}, ~{result['expected_ms']:.1f} ms/frame")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
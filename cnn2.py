@@ -1,3 +1,4 @@
+import tensorflow as tf
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.models import Model
@@ -8,6 +9,19 @@ import os
 
 train_dir = 'processed_data'
 
+# IMG_SIZE=96 MODEL_OUT=gesture_fast.h5 LABELS_OUT=class_indices_fast.json trains
+# the low-resolution first stage of the cascade (see cascade.py)
+img_size = int(os.environ.get('IMG_SIZE', 160))
+model_out = os.environ.get('MODEL_OUT', 'gesture_mobilenet_advanced2.h5')
+labels_out = os.environ.get('LABELS_OUT', 'class_indices.json')
+epochs = int(os.environ.get('EPOCHS', 10))
+
+# Thread pools have to be sized before TensorFlow runs its first op
+if os.environ.get('INTRA_OP_THREADS'):
+    tf.config.threading.set_intra_op_parallelism_threads(int(os.environ['INTRA_OP_THREADS']))
+if os.environ.get('INTER_OP_THREADS'):
+    tf.config.threading.set_inter_op_parallelism_threads(int(os.environ['INTER_OP_THREADS']))
+
 # AUTO-CLEAN unwanted system/junk folders
 for folder in os.listdir(train_dir):
     folder_path = os.path.join(train_dir, folder)
@@ -26,26 +40,63 @@ datagen = ImageDataGenerator(
     horizontal_flip=True
 )
 
-train_gen = datagen.flow_from_directory(
-    train_dir,
-    target_size=(160, 160),
-    batch_size=32,
-    class_mode='categorical',
-    subset='training'
-)
+# Optional group-aware split from dedup_dataset.py, so near-duplicate bursts
+# never end up on both sides of the validation split
+split_manifest = os.environ.get('SPLIT_MANIFEST')
 
-val_gen = datagen.flow_from_directory(
-    train_dir,
-    target_size=(160, 160),
-    batch_size=32,
-    class_mode='categorical',
-    subset='validation'
-)
+if split_manifest:
+    import pandas as pd
+    split = pd.read_csv(split_manifest)  # filenames are relative to train_dir
+    missing = [f for f in split['filename'] if not os.path.exists(os.path.join(train_dir, f))]
+    if missing:
+        raise SystemExit(f"{len(missing)} manifest files not found under {train_dir} (e.g. {missing[0]}); "
+                         f"build the manifest with: python dedup_dataset.py --data {train_dir}")
+    # One class list for both generators, a class with no validation group
+    # must not shift the indices or change num_classes
+    classes = sorted(split['class'].unique())
+    print(f"📋 Using split manifest {split_manifest}")
+    train_gen = datagen.flow_from_dataframe(
+        split[split['split'] == 'train'],
+        directory=train_dir,
+        x_col='filename',
+        y_col='class',
+        classes=classes,
+        target_size=(img_size, img_size),
+        batch_size=32,
+        class_mode='categorical'
+    )
+
+    val_gen = datagen.flow_from_dataframe(
+        split[split['split'] == 'validation'],
+        directory=train_dir,
+        x_col='filename',
+        y_col='class',
+        classes=classes,
+        target_size=(img_size, img_size),
+        batch_size=32,
+        class_mode='categorical'
+    )
+else:
+    train_gen = datagen.flow_from_directory(
+        train_dir,
+        target_size=(img_size, img_size),
+        batch_size=32,
+        class_mode='categorical',
+        subset='training'
+    )
+
+    val_gen = datagen.flow_from_directory(
+        train_dir,
+        target_size=(img_size, img_size),
+        batch_size=32,
+        class_mode='categorical',
+        subset='validation'
+    )
 
 print("✅ Cleaned classes:", train_gen.class_indices)
 
 # Load MobileNetV2 base
-base_model = MobileNetV2(input_shape=(160, 160, 3), include_top=False, weights='imagenet')
+base_model = MobileNetV2(input_shape=(img_size, img_size, 3), include_top=False, weights='imagenet')
 base_model.trainable = False
 
 # Custom head
@@ -55,14 +106,29 @@ x = Dropout(0.5)(x)
 predictions = Dense(train_gen.num_classes, activation='softmax')(x)
 model = Model(inputs=base_model.input, outputs=predictions)
 
-model.compile(optimizer=Adam(learning_rate=0.001), loss='categorical_crossentropy', metrics=['accuracy'])
-model.fit(train_gen, validation_data=val_gen, epochs=10)
+# CHECKPOINT_DIR switches to the resumable XLA loop in train_loop.py; rerunning
+# with the same directory continues where the last run stopped
+checkpoint_dir = os.environ.get('CHECKPOINT_DIR')
+
+if checkpoint_dir:
+    from train_loop import train_resumable
+    train_resumable(
+        model, base_model, train_gen, val_gen, checkpoint_dir,
+        epochs=epochs,
+        fine_tune_epochs=int(os.environ.get('FINE_TUNE_EPOCHS', 0)),
+        fine_tune_blocks=int(os.environ.get('FINE_TUNE_BLOCKS', 3)),
+        checkpoint_every=int(os.environ.get('CHECKPOINT_EVERY', 200)),
+        jit_compile=os.environ.get('XLA', '1') == '1'
+    )
+else:
+    model.compile(optimizer=Adam(learning_rate=0.001), loss='categorical_crossentropy', metrics=['accuracy'])
+    model.fit(train_gen, validation_data=val_gen, epochs=epochs)
 import json
 
 # Save class indices
-with open('class_indices.json', 'w') as f:
+with open(labels_out, 'w') as f:
     json.dump(train_gen.class_indices, f)
-print("✅ Saved class_indices.json")
+print(f"✅ Saved {labels_out}")
 
-model.save('gesture_mobilenet_advanced2.h5')
-print("✅ Model saved as gesture_mobilenet_advanced2.h5")
+model.save(model_out)
+print(f"✅ Model saved as {model_out}")
@@ -0,0 +1,220 @@
+"""Near-duplicate detection and group-aware train/validation split for data/.
+
+Usage:
+    python dedup_dataset.py --data data --threshold 6 --out dedup
+
+Every image gets a 64-bit perceptual hash (DCT pHash). Hashes are cached in
+<out>/hashes.json keyed by path, size and mtime, so re-runs only hash new
+files. Near-duplicates (Hamming distance <= threshold) are found with a
+multi-index hash: the 64 bits are split into threshold + 1 bands, and by
+pigeonhole any two hashes within the threshold agree exactly on at least
+one band, so only images sharing a band bucket are compared. Matches are
+merged into groups with union-find.
+
+Outputs:
+    groups.json     every group with more than one member
+    manifest.csv    filename,class,group,keep  (keep = 1 for one image per group)
+    split.csv       filename,class,split with whole groups assigned to train or
+                    validation, for cnn2.py (SPLIT_MANIFEST=dedup/split.csv)
+
+Filenames are relative to --data, so a split for cnn2.py has to be built from
+the directory it trains on: python dedup_dataset.py --data processed_data
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+from collections import defaultdict
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def phash(path):
+    """64-bit DCT perceptual hash as an int, or None if unreadable"""
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    img = cv2.resize(img, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(img)[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # skip the DC term, it only tracks brightness
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _hash_entry(path):
+    return path, phash(path)
+
+
+def list_images(data_dir):
+    paths = []
+    for class_dir in sorted(glob.glob(os.path.join(data_dir, '*'))):
+        if not os.path.isdir(class_dir) or os.path.basename(class_dir).startswith('.'):
+            continue
+        for path in sorted(os.listdir(class_dir)):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_dir, path))
+    return paths
+
+
+def compute_hashes(paths, cache_path, workers):
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    def key(path):
+        st = os.stat(path)
+        return f"{st.st_size}:{int(st.st_mtime)}"
+
+    hashes, todo = {}, []
+    for path in paths:
+        entry = cache.get(path)
+        if entry and entry['key'] == key(path):
+            hashes[path] = entry['hash']
+        else:
+            todo.append(path)
+
+    if todo:
+        print(f"🔍 Hashing {len(todo)} new images ({len(hashes)} cached)")
+        with Pool(workers) as pool:
+            for path, h in pool.imap_unordered(_hash_entry, todo, chunksize=64):
+                if h is not None:
+                    hashes[path] = h
+                    cache[path] = {'key': key(path), 'hash': h}
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f)
+    return hashes
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n)
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount64(x):
+    """Vectorised popcount for a uint64 array"""
+    return POPCOUNT8[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1)
+
+
+def find_groups(hash_values, threshold, max_pairs=4_000_000):
+    """Union-find groups of indices whose hashes are within `threshold` bits"""
+    hashes = np.array(hash_values, dtype=np.uint64)
+    n = len(hashes)
+    uf = UnionFind(n)
+    bands = threshold + 1
+    edges = np.linspace(0, 64, bands + 1).astype(int)
+    compared = 0
+
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        mask = np.uint64((1 << (hi - lo)) - 1)
+        keys = (hashes >> np.uint64(lo)) & mask
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], n]
+        for start, end in zip(starts, ends):
+            if end - start < 2:
+                continue
+            members = order[start:end]
+            # Big buckets (e.g. near-blank frames) are compared in slices to bound memory
+            step = max(1, max_pairs // len(members))
+            for i in range(0, len(members), step):
+                block = members[i:i + step]
+                others = members[i + 1:]  # upper triangle only
+                if not len(others):
+                    break
+                dist = _popcount64(hashes[block][:, None] ^ hashes[others][None, :])
+                compared += dist.size
+                rows, cols = np.nonzero(dist <= threshold)
+                for r, c in zip(rows, cols):
+                    if block[r] != others[c]:
+                        uf.union(block[r], others[c])
+
+    groups = defaultdict(list)
+    for i in range(n):
+        groups[uf.find(i)].append(i)
+    return list(groups.values()), compared
+
+
+def assign_split(group_id, val_fraction, seed):
+    """Deterministic per-group split so a group never straddles train and validation"""
+    digest = hashlib.md5(f"{seed}:{group_id}".encode()).hexdigest()
+    return 'validation' if int(digest[:8], 16) / 0xFFFFFFFF < val_fraction else 'train'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate images and build a group-aware split")
+    parser.add_argument('--data', default='data')
+    parser.add_argument('--out', default='dedup')
+    parser.add_argument('--threshold', type=int, default=6, help="max Hamming distance of duplicates")
+    parser.add_argument('--val-fraction', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    paths = list_images(args.data)
+    hashes = compute_hashes(paths, os.path.join(args.out, 'hashes.json'), args.workers)
+    paths = [p for p in paths if p in hashes]
+
+    # Duplicates are only merged within a class; a cross-class match is a labelling problem
+    by_class = defaultdict(list)
+    for path in paths:
+        by_class[os.path.basename(os.path.dirname(path))].append(path)
+
+    rows, dup_groups = [], []
+    total_compared = 0
+    for label, class_paths in sorted(by_class.items()):
+        groups, compared = find_groups([hashes[p] for p in class_paths], args.threshold)
+        total_compared += compared
+        for members in groups:
+            members = sorted(class_paths[i] for i in members)
+            group_id = f"{label}/{os.path.basename(members[0])}"
+            split = assign_split(group_id, args.val_fraction, args.seed)
+            if len(members) > 1:
+                dup_groups.append({'group': group_id, 'class': label, 'members': members})
+            for i, path in enumerate(members):
+                rows.append({'filename': os.path.relpath(path, args.data), 'class': label,
+                             'group': group_id, 'keep': int(i == 0), 'split': split})
+        kept = sum(1 for r in rows if r['class'] == label and r['keep'])
+        print(f"  {label}: {len(class_paths)} images -> {kept} unique")
+
+    with open(os.path.join(args.out, 'groups.json'), 'w') as f:
+        json.dump(dup_groups, f, indent=2)
+    with open(os.path.join(args.out, 'manifest.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['filename', 'class', 'group', 'keep'])
+        writer.writeheader()
+        writer.writerows({k: r[k] for k in writer.fieldnames} for r in rows)
+    with open(os.path.join(args.out, 'split.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['filename', 'class', 'split'])
+        writer.writeheader()
+        writer.writerows({k: r[k] for k in writer.fieldnames} for r in rows if r['keep'])
+
+    kept = sum(r['keep'] for r in rows)
+    print(f"✅ {len(rows)} images, {len(dup_groups)} duplicate groups, {kept} kept "
+          f"({total_compared} hash comparisons instead of {len(rows) ** 2})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Per-user few-shot sign enrollment.
+
+Usage:
+    python enrollment.py alice my_sign --count 10     record samples of a sign
+    python enrollment.py alice --list
+    python enrollment.py alice --remove my_sign
+
+A handful of hand crops per sign go through the gesture model's backbone,
+and their embeddings (the pooled features the softmax head sees) are stored
+in a per-user index at enrollments/<user>.npz. At recognition time the same
+forward pass yields the embedding and the softmax, so querying the index
+costs one matrix product: a few hundred signs x a few samples each is well
+under a millisecond. Vectors are L2-normalised and stored as float16; search
+runs on a float32 copy (numpy has no fast float16 matmul) that is rebuilt
+only when the index changes.
+
+The pooled features are non-negative, so even unrelated hands have a fairly
+high cosine similarity. An enrolled match therefore only answers frames the
+softmax head has no confident label for, and it has to beat the best sample
+of any other enrolled sign by a margin. Both thresholds can be tuned with
+BEABLED_MIN_SIMILARITY and BEABLED_MIN_MARGIN.
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+ENROLLMENT_DIR = os.environ.get('BEABLED_ENROLLMENTS', 'enrollments')
+MIN_SIMILARITY = float(os.environ.get('BEABLED_MIN_SIMILARITY', 0.85))
+MIN_MARGIN = float(os.environ.get('BEABLED_MIN_MARGIN', 0.05))
+
+
+def embedding_model(model):
+    """Two-output model: (embedding, softmax) from one forward pass.
+
+    The embedding is the input to the final Dense layer, i.e. the pooled
+    backbone features (cnn2.py puts only a Dropout between them).
+    """
+    import tensorflow as tf
+
+    return tf.keras.Model(model.input, [model.layers[-2].output, model.output])
+
+
+def _normalise(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class EmbeddingIndex:
+    """Nearest-neighbour index over enrolled samples, cosine similarity"""
+
+    def __init__(self, dim, vectors=None, labels=None):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim), np.float16) if vectors is None else vectors.astype(np.float16)
+        self.labels = np.array([] if labels is None else labels, dtype=object)
+        self._search_matrix = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def signs(self):
+        """{label: sample count}"""
+        names, counts = np.unique(self.labels.astype(str), return_counts=True)
+        return dict(zip(names.tolist(), counts.tolist()))
+
+    def add(self, label, embeddings):
+        embeddings = _normalise(embeddings)
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d embeddings, got {embeddings.shape[1]}")
+        self.vectors = np.concatenate([self.vectors, embeddings.astype(np.float16)])
+        self.labels = np.concatenate([self.labels, np.array([label] * len(embeddings), dtype=object)])
+        self._search_matrix = None
+
+    def remove(self, label):
+        keep = self.labels != label
+        removed = int((~keep).sum())
+        self.vectors, self.labels = self.vectors[keep], self.labels[keep]
+        self._search_matrix = None
+        return removed
+
+    def search(self, queries):
+        """Best match per query row: (labels, similarities, runner-up similarities).
+
+        The runner-up is the best sample of any other label, -1 if there is
+        none. Labels are None for an empty index.
+        """
+        queries = _normalise(np.atleast_2d(queries))
+        if not len(self):
+            empty = np.zeros(len(queries), np.float32)
+            return [None] * len(queries), empty, empty - 1
+        if self._search_matrix is None:
+            self._search_matrix = np.ascontiguousarray(self.vectors.astype(np.float32).T)
+        similarities = queries @ self._search_matrix
+        rows = np.arange(len(queries))
+        best = similarities.argmax(axis=1)
+        labels = self.labels[best]
+        others = np.where(self.labels[None, :] == labels[:, None], -1.0, similarities).max(axis=1)
+        return list(labels), similarities[rows, best], others
+
+    def save(self, path):
+        """Atomic write, so a crash mid-save never leaves a truncated index"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, vectors=self.vectors, labels=self.labels.astype(str))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, dim=None):
+        """Index from `path`, or an empty one of size `dim` if it doesn't exist yet"""
+        if not os.path.exists(path):
+            if dim is None:
+                raise FileNotFoundError(path)
+            return cls(dim)
+        with np.load(path) as data:
+            vectors, labels = data['vectors'], data['labels']
+        return cls(vectors.shape[1], vectors, labels.astype(object))
+
+
+def index_path(user, root=ENROLLMENT_DIR):
+    if not re.fullmatch(r'[\w.-]+', user):
+        raise ValueError(f"Invalid user name: {user!r}")
+    return os.path.join(root, f"{user}.npz")
+
+
+def combine(label, confidence, match, similarity, runner_up=-1.0,
+            min_similarity=MIN_SIMILARITY, min_margin=MIN_MARGIN):
+    """Pick between the softmax answer and the enrolled nearest neighbour.
+
+    When the softmax head has no confident label, a close enough match to the
+    user's own samples that clearly beats every other enrolled sign answers
+    instead: a sign the head doesn't know or the user's personal way of
+    signing one. Returns (label, confidence, enrolled).
+    """
+    if (label is None and match is not None and similarity >= min_similarity
+            and similarity - runner_up >= min_margin):
+        return match, float(similarity), True
+    return label, confidence, False
+
+
+class EnrolledClassifier:
+    """Softmax head plus the user's enrolled signs, from one forward pass"""
+
+    def __init__(self, model, idx_to_class, enrollments=None, threshold=0.7,
+                 min_similarity=MIN_SIMILARITY, min_margin=MIN_MARGIN):
+        self.model = model
+        self.idx_to_class = idx_to_class
+        self.enrollments = enrollments
+        self.embedder = embedding_model(model) if enrollments is not None else None
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+
+    def classify(self, batch):
+        """(label or None, confidence) for a batch holding one prepared crop"""
+        if self.embedder is not None:
+            embedding, preds = self.embedder.predict(batch, verbose=0)
+        else:
+            preds = self.model.predict(batch, verbose=0)
+        class_idx = int(np.argmax(preds[0]))
+        confidence = float(preds[0][class_idx])
+        label = None
+        if confidence > self.threshold and class_idx in self.idx_to_class:
+            label = self.idx_to_class[class_idx]
+        if self.embedder is not None:
+            matches, similarities, others = self.enrollments.search(embedding)
+            label, confidence, _ = combine(label, confidence, matches[0], float(similarities[0]),
+                                           float(others[0]), self.min_similarity, self.min_margin)
+        return label, confidence
+
+
+def main():
+    from asl_pipeline import load_model, hand_bbox, prepare_crop, MODEL_PATH, LABELS_PATH
+    from quality_gate import QualityGate, handedness_score
+    import mediapipe as mp
+
+    parser = argparse.ArgumentParser(description="Enroll personal signs for a user")
+    parser.add_argument('user')
+    parser.add_argument('label', nargs='?')
+    parser.add_argument('--count', type=int, default=10, help="samples to record")
+    parser.add_argument('--every', type=float, default=0.3, help="seconds between samples")
+    parser.add_argument('--list', action='store_true')
+    parser.add_argument('--remove', metavar='LABEL')
+    parser.add_argument('--root', default=ENROLLMENT_DIR)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--labels', default=LABELS_PATH)
+    parser.add_argument('--camera', type=int, default=0)
+    args = parser.parse_args()
+
+    path = index_path(args.user, args.root)
+    if args.list or args.remove:
+        index = EmbeddingIndex.load(path)
+        if args.remove:
+            print(f"🗑️ Removed {index.remove(args.remove)} samples of {args.remove}")
+            index.save(path)
+        for label, count in sorted(index.signs().items()):
+            print(f"  {label}: {count} samples")
+        return
+    if not args.label:
+        parser.error("a label is required to enroll")
+
+    model, _ = load_model(args.model, args.labels)
+    img_size = tuple(model.input_shape[1:3])
+    embedder = embedding_model(model)
+    index = EmbeddingIndex.load(path, dim=embedder.output_shape[0][-1])
+    hands = mp.solutions.hands.Hands(max_num_hands=1)
+    quality_gate = QualityGate()
+    cap = cv2.VideoCapture(args.camera)
+
+    crops = []
+    last_sample = 0.0
+    while len(crops) < args.count:
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        frame = cv2.flip(frame, 1)
+        result = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if result.multi_hand_landmarks:
+            hand_landmarks = result.multi_hand_landmarks[0]
+            h, w, _ = frame.shape
+            x_min, y_min, x_max, y_max = hand_bbox(hand_landmarks, w, h)
+            crop = frame[y_min:y_max, x_min:x_max]
+            usable = crop.size and not quality_gate.check(crop, hand_landmarks, handedness_score(result, 0))
+            if usable and time.time() - last_sample >= args.every:
+                crops.append(prepare_crop(crop, img_size))
+                last_sample = time.time()
+            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0) if usable else (0, 0, 255), 2)
+        cv2.putText(frame, f"{args.label}: {len(crops)}/{args.count}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        cv2.imshow('Enrollment', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+    cap.release()
+    cv2.destroyAllWindows()
+    hands.close()
+
+    if not crops:
+        print("No samples recorded")
+        return
+    embeddings, _ = embedder.predict(np.stack(crops), verbose=0)
+    index.add(args.label, embeddings)
+    index.save(path)
+    print(f"✅ Enrolled {len(crops)} samples of '{args.label}' for {args.user} "
+          f"({len(index)} samples, {len(index.signs())} signs in {path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Sink for hard examples: hands the model saw but wasn't confident about.
+
+A sampled fraction of low-confidence crops is queued together with their
+landmarks and top-k scores, and a background writer stores them in shards:
+
+    <root>/<shard>/<predicted class>/<label>.<uuid1>.jpg / .xml / .json
+
+Each shard has the same layout as data/<class>/ (see capture_dataset.py),
+so after relabelling it can be merged into the training set or run through
+dedup_dataset.py as is. offer() never blocks: when the queue is full the
+sample is dropped and counted. Writes happen in batches with one fsync
+round per batch; a sample that fails is logged, counted and cleaned up
+without taking the rest of its batch with it.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from capture_dataset import VOC_TEMPLATE, landmark_bbox
+
+logger = logging.getLogger(__name__)
+
+
+class HardExampleSink:
+    def __init__(self, root, sample_rate=0.1, top_k=3, queue_size=256, batch_size=32,
+                 shard_size=1000, quality=95, run_blocking=None):
+        self.root = root
+        self.sample_rate = sample_rate
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self.quality = quality
+        # Lets the caller push disk I/O onto a real OS thread (eventlet's tpool)
+        self.run_blocking = run_blocking or (lambda fn, *args: fn(*args))
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.shard = None
+        self.shard_count = 0
+        self.shards = 0  # only touched by the writer
+        self.counts = {'offered': 0, 'sampled': 0, 'dropped': 0, 'written': 0, 'failed': 0}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def offer(self, crop, scores, idx_to_class, landmarks=None, frame_landmarks=None, model_version=None):
+        """Maybe queue a low-confidence crop; never blocks. Returns True if queued.
+
+        `scores` is the softmax row. `landmarks` are normalised to the crop and
+        give the VOC bbox; `frame_landmarks` (normalised to a frame we don't
+        have, as sent by browser clients) are only kept in the sidecar.
+        """
+        with self.lock:
+            self.counts['offered'] += 1
+        if random.random() >= self.sample_rate:
+            return False
+        top = np.argsort(scores)[::-1][:self.top_k]
+        sample = {
+            'crop': np.array(crop),  # own copy: a view would keep the whole request frame alive in the queue
+            'top_k': [[idx_to_class.get(int(i), str(i)), float(scores[i])] for i in top],
+            'landmarks': None if landmarks is None else np.asarray(landmarks, dtype=float).tolist(),
+            'frame_landmarks': None if frame_landmarks is None else np.asarray(frame_landmarks, dtype=float).tolist(),
+            'model': model_version,
+            'captured_at': time.time(),
+        }
+        try:
+            self.queue.put_nowait(sample)
+        except queue.Full:
+            with self.lock:
+                self.counts['dropped'] += 1
+            return False
+        with self.lock:
+            self.counts['sampled'] += 1
+        return True
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                written = self.run_blocking(self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"Hard example write failed: {e}")
+                written = 0
+            with self.lock:
+                self.counts['written'] += written
+                self.counts['failed'] += len(batch) - written
+
+    def _next_shard(self):
+        if self.shard is None or self.shard_count >= self.shard_size:
+            self.shard = os.path.join(self.root, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}")
+            self.shard_count = 0
+            self.shards += 1
+        self.shard_count += 1
+        return self.shard
+
+    def _write_batch(self, batch):
+        """Write and fsync each sample; returns how many made it to disk"""
+        written, dirs = [], set()
+        for sample in batch:
+            try:
+                paths = self._write(sample)
+            except Exception as e:
+                logger.error(f"Hard example write failed: {e}")
+                continue
+            written.append(paths)
+            class_dir = os.path.dirname(paths[0])
+            dirs.update((class_dir, os.path.dirname(class_dir)))  # new entries in both
+        synced = 0
+        for paths in written:
+            try:
+                for path in paths:
+                    _fsync(path)
+                synced += 1
+            except OSError as e:
+                logger.error(f"Hard example fsync failed: {e}")
+        for path in sorted(dirs):
+            try:
+                _fsync(path)
+            except OSError as e:
+                logger.error(f"Hard example fsync failed: {e}")
+        return synced
+
+    def _write(self, sample):
+        crop = sample['crop']
+        h, w, depth = crop.shape
+        label = sample['top_k'][0][0]
+        class_dir = os.path.join(self._next_shard(), label)
+        os.makedirs(class_dir, exist_ok=True)
+        stem = f"{label}.{uuid.uuid1()}"
+        jpg_path = os.path.join(class_dir, stem + '.jpg')
+
+        truncated = False
+        x_min, y_min, x_max, y_max = 0, 0, w, h
+        if sample['landmarks']:
+            (x_min, y_min, x_max, y_max), truncated = landmark_bbox(sample['landmarks'], w, h)
+        ok, encoded = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        files = {
+            jpg_path: encoded.tobytes(),
+            os.path.join(class_dir, stem + '.xml'): VOC_TEMPLATE.format(
+                folder=label, filename=stem + '.jpg', path=os.path.abspath(jpg_path),
+                width=w, height=h, depth=depth, label=label, truncated=int(truncated),
+                xmin=x_min, ymin=y_min, xmax=x_max, ymax=y_max).encode(),
+            os.path.join(class_dir, stem + '.json'): json.dumps({
+                'image': stem + '.jpg', 'width': w, 'height': h, 'landmarks': sample['landmarks'],
+                'frame_landmarks': sample['frame_landmarks'], 'top_k': sample['top_k'], 'model': sample['model'],
+                'captured_at': sample['captured_at']}).encode(),
+        }
+        try:
+            for path, payload in files.items():
+                with open(path, 'wb') as f:
+                    f.write(payload)
+        except OSError:
+            for path in files:  # don't leave an image without its annotations
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise
+        return list(files)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        stats['shards'] = self.shards
+        stats['queued'] = self.queue.qsize()
+        return stats
+
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
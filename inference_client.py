@@ -0,0 +1,172 @@
+"""Thin client for inference_daemon.py.
+
+Frames are copied into a shared-memory block owned by the client and only a
+small JSON header travels over the Unix domain socket, so a 640x480 frame
+costs one memcpy instead of a pickle + socket copy. This module deliberately
+doesn't import TensorFlow or MediaPipe: front ends that connect to the daemon
+never load either.
+"""
+import json
+import os
+import socket
+import struct
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+SOCKET_PATH = os.environ.get('BEABLED_INFERENCE_SOCKET', '/tmp/beabled-inference.sock')
+
+# Same topology as mediapipe.solutions.hands.HAND_CONNECTIONS
+HAND_CONNECTIONS = [
+    (0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12), (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+]
+
+_HEADER = struct.Struct('!I')
+
+
+def send_message(sock, message):
+    payload = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise ConnectionError("Inference daemon closed the connection")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, length))
+
+
+class InferenceClient:
+    def __init__(self, sock, capacity=1920 * 1080 * 3):
+        self.sock = sock
+        self.shm = None
+        self._allocate(capacity)
+
+    @classmethod
+    def connect(cls, path=SOCKET_PATH, timeout=5.0):
+        """Connected client, or None if the daemon isn't running"""
+        if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+            return cls(sock)
+        except OSError:
+            sock.close()
+            return None
+
+    def _allocate(self, capacity):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity)
+        send_message(self.sock, {'op': 'attach', 'name': self.shm.name, 'size': capacity})
+        reply = recv_message(self.sock)
+        if reply.get('status') != 'ok':
+            raise ConnectionError(reply.get('message', 'attach failed'))
+
+    def _request(self, op, image, **extra):
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        if image.nbytes > self.shm.size:
+            self._allocate(image.nbytes)
+        np.copyto(np.ndarray(image.shape, np.uint8, buffer=self.shm.buf), image)
+        send_message(self.sock, dict(extra, op=op, shape=list(image.shape)))
+        reply = recv_message(self.sock)
+        if reply.get('status') != 'ok':
+            raise RuntimeError(reply.get('message', 'inference failed'))
+        return reply
+
+    def process_frame(self, frame):
+        """Full pipeline on a BGR frame.
+
+        Returns a list of hands, each a dict with 'landmarks' (normalised
+        [x, y, z]), 'bbox' (x_min, y_min, x_max, y_max), 'label',
+        'confidence' and 'rejected' (quality gate reason or None).
+        """
+        return self._request('frame', frame)['hands']
+
+    def classify_crop(self, crop):
+        """(label, confidence) for an already cropped BGR hand"""
+        reply = self._request('crop', crop)
+        return reply['label'], reply['confidence']
+
+    def close(self):
+        try:
+            send_message(self.sock, {'op': 'bye'})
+        except OSError:
+            pass
+        self.sock.close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class DaemonConnection:
+    """Thin client mode for the front ends.
+
+    Lets inference_daemon.py do the work if it's running, so the front end
+    never loads TensorFlow or MediaPipe, and calls `load_in_process()` when
+    there is no daemon at startup or when it dies, restarts or errors out
+    mid-session. If that load fails too, `on_unavailable(error)` is called
+    (default: print it) and `available` turns False.
+    """
+
+    def __init__(self, load_in_process, on_unavailable=None, use_daemon=True):
+        self.load_in_process = load_in_process
+        self.on_unavailable = on_unavailable or (lambda e: print(f"Error loading ASL model: {e}"))
+        self.available = True
+        self.client = InferenceClient.connect() if use_daemon else None
+        if self.client is None:
+            self._load()
+
+    @property
+    def remote(self):
+        return self.client is not None
+
+    def _load(self):
+        try:
+            self.load_in_process()
+        except Exception as e:
+            self.available = False
+            self.on_unavailable(e)
+
+    def process_frame(self, frame):
+        """InferenceClient.process_frame, or None if the daemon was just lost"""
+        try:
+            return self.client.process_frame(frame)
+        except (OSError, RuntimeError) as e:  # connection gone, or an error reply
+            print(f"Lost the inference daemon ({e}), loading the model in process")
+            client, self.client = self.client, None
+            try:
+                client.close()
+            except OSError:
+                pass  # the daemon may have taken the socket or shared memory with it
+            self._load()
+            return None
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+def draw_hand(frame, landmarks, color=(0, 255, 0)):
+    """Draw normalised landmarks the way mp_draw.draw_landmarks would, without MediaPipe"""
+    h, w, _ = frame.shape
+    points = [(int(x * w), int(y * h)) for x, y, _ in landmarks]
+    for a, b in HAND_CONNECTIONS:
+        cv2.line(frame, points[a], points[b], (255, 255, 255), 2)
+    for point in points:
+        cv2.circle(frame, point, 3, color, -1)
@@ -0,0 +1,179 @@
+"""Local inference daemon shared by the desktop front ends.
+
+Usage:
+    python inference_daemon.py
+
+Holds a single Keras model and serves test2.py, video_UI.py and
+BeAbled_UI.py over a Unix domain socket (see inference_client.py for the
+protocol). Each connection gets its own MediaPipe Hands graph, so hand
+tracking state never mixes between apps, and its own quality gate; the
+model is shared behind a lock. With --cascade, a low-resolution fast model
+answers first and the full model only sees its uncertain frames.
+"""
+import argparse
+import logging
+import os
+import socketserver
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from cascade import Cascade, Classifier, FAST_MODEL_PATH, FAST_LABELS_PATH
+from enrollment import EmbeddingIndex, EnrolledClassifier, index_path
+from asl_pipeline import load_model, hand_bbox, prepare_crop, CONFIDENCE_THRESHOLD, MODEL_PATH, LABELS_PATH
+from inference_client import SOCKET_PATH, send_message, recv_message
+from quality_gate import QualityGate, handedness_score
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SharedModel:
+    def __init__(self, model_path, labels_path, cascade=None, enrollments=None):
+        self.model, self.idx_to_class = load_model(model_path, labels_path)
+        self.img_size = tuple(self.model.input_shape[1:3])
+        self.cascade = cascade
+        self.classifier = EnrolledClassifier(self.model, self.idx_to_class, enrollments, CONFIDENCE_THRESHOLD)
+        self.lock = threading.Lock()
+        # Warm up before the first client
+        blank = np.zeros((*self.img_size, 3), np.uint8)
+        self._classify_full(blank)
+        if cascade is not None:
+            cascade.fast.predict(np.zeros((1, *cascade.fast.input_size, 3), np.float32))
+
+    def classify(self, cropped_hand):
+        with self.lock:
+            if self.cascade is None:
+                return self._classify_full(cropped_hand)
+            label, confidence, _ = self.cascade.classify(cropped_hand, self._classify_full)
+            return label, confidence
+
+    def _classify_full(self, cropped_hand):
+        batch = np.expand_dims(prepare_crop(cropped_hand, self.img_size), axis=0)
+        return self.classifier.classify(batch)
+
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.shm = None
+        self.hands = mp.solutions.hands.Hands(max_num_hands=1)
+        self.quality_gate = QualityGate()
+
+    def handle(self):
+        while True:
+            try:
+                message = recv_message(self.request)
+            except ConnectionError:
+                break
+            op = message.get('op')
+            if op == 'bye':
+                break
+            try:
+                reply = self.dispatch(op, message)
+                reply['status'] = 'ok'
+            except Exception as e:
+                logger.error(f"Inference request failed: {e}")
+                reply = {'status': 'error', 'message': str(e)}
+            send_message(self.request, reply)
+
+    def dispatch(self, op, message):
+        if op == 'attach':
+            self._attach(message['name'])
+            return {}
+        image = np.ndarray(tuple(message['shape']), np.uint8, buffer=self.shm.buf)
+        if op == 'frame':
+            return {'hands': self.process_frame(image)}
+        if op == 'crop':
+            label, confidence = self.server.model.classify(image)
+            return {'label': label, 'confidence': confidence}
+        raise ValueError(f"Unknown op: {op}")
+
+    def _attach(self, name):
+        if self.shm is not None:
+            self.shm.close()
+        self.shm = shared_memory.SharedMemory(name=name)
+        # The client owns the block; stop our resource tracker from unlinking it at exit
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+    def process_frame(self, frame):
+        result = self.hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        hands = []
+        if not result.multi_hand_landmarks:
+            return hands
+        h, w, _ = frame.shape
+        for i, hand_landmarks in enumerate(result.multi_hand_landmarks):
+            bbox = hand_bbox(hand_landmarks, w, h)
+            x_min, y_min, x_max, y_max = bbox
+            hand = {
+                'landmarks': [[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark],
+                'bbox': bbox, 'label': None, 'confidence': 0.0, 'rejected': None
+            }
+            cropped_hand = frame[y_min:y_max, x_min:x_max]
+            if cropped_hand.size == 0:
+                hand['rejected'] = 'empty'
+            else:
+                hand['rejected'] = self.quality_gate.check(
+                    cropped_hand, hand_landmarks, handedness_score(result, i))
+            if hand['rejected'] is None:
+                hand['label'], hand['confidence'] = self.server.model.classify(cropped_hand)
+            hands.append(hand)
+        return hands
+
+    def finish(self):
+        self.hands.close()
+        if self.shm is not None:
+            self.shm.close()
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, model):
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        self.model = model
+        super().__init__(path, InferenceHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ASL inference to local front ends")
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--labels', default=LABELS_PATH)
+    parser.add_argument('--cascade', action='store_true', help="run the fast model first (see cascade.py)")
+    parser.add_argument('--fast-model', default=FAST_MODEL_PATH)
+    parser.add_argument('--fast-labels', default=FAST_LABELS_PATH)
+    parser.add_argument('--band', type=float, nargs=2, default=(0.5, 0.9), metavar=('LOW', 'HIGH'))
+    parser.add_argument('--min-margin', type=float, default=0.2)
+    # Enrolled signs are unfamiliar to the fast model, so with --cascade they
+    # mostly land in the uncertainty band and reach the index via escalation
+    parser.add_argument('--user', default=os.environ.get('BEABLED_USER'),
+                        help="match this user's enrolled signs (see enrollment.py)")
+    args = parser.parse_args()
+
+    cascade = None
+    if args.cascade:
+        cascade = Cascade(Classifier(args.fast_model, args.fast_labels), *args.band, args.min_margin)
+    enrollments = None
+    if args.user and os.path.exists(index_path(args.user)):
+        enrollments = EmbeddingIndex.load(index_path(args.user))
+        logger.info(f"Loaded {len(enrollments.signs())} enrolled signs for {args.user}")
+    model = SharedModel(args.model, args.labels, cascade, enrollments)
+    server = InferenceServer(args.socket, model)
+    logger.info(f"Inference daemon listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cascade is not None:
+            logger.info(f"Cascade: {cascade.stats()}")
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
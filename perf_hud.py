@@ -0,0 +1,171 @@
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+
+import cv2
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # CPU/RSS just aren't shown without it
+    psutil = None
+
+_NULL_STAGE = nullcontext()
+
+
+class _Stage:
+    __slots__ = ('monitor', 'name', 'start')
+
+    def __init__(self, monitor, name):
+        self.monitor = monitor
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.monitor.timings[self.name].append(time.perf_counter() - self.start)
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed rate and writes folded stacks.
+
+    The output (one "outer;inner;leaf count" line per stack) loads directly
+    into flamegraph.pl, speedscope or similar tools.
+    """
+
+    def __init__(self, thread_id, seconds, path, interval=0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.seconds = seconds
+        self.path = path
+        self.interval = interval
+        self.counts = defaultdict(int)
+
+    def run(self):
+        end = time.perf_counter() + self.seconds
+        while time.perf_counter() < end:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+        with open(self.path, 'w') as f:
+            for stack, count in sorted(self.counts.items(), key=lambda kv: -kv[1]):
+                f.write(f"{stack} {count}\n")
+        print(f"📝 Frame loop profile written to {self.path}")
+
+
+class PerfMonitor:
+    """Per-stage latency, FPS and process stats for the desktop frame loops.
+
+    Everything is skipped while the HUD is off: stage() hands back a shared
+    no-op context manager and the counters are not touched.
+    """
+
+    def __init__(self, window=120, expected_interval=0.03):
+        self.enabled = False
+        self.window = window
+        self.expected_interval = expected_interval
+        self.profiler = None
+        self.reset()
+
+    def reset(self):
+        self.timings = defaultdict(lambda: deque(maxlen=self.window))
+        self.frame_times = deque(maxlen=self.window)
+        self.inference_times = deque(maxlen=self.window)
+        self.dropped = 0
+        self.process_stats = ''
+        self.last_process_sample = 0.0
+        self.process = psutil.Process() if psutil else None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.reset()
+        return self.enabled
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def frame(self):
+        """Call once per frame loop tick"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_times:
+            gap = now - self.frame_times[-1]
+            # Ticks the timer should have fired but couldn't because the loop was busy
+            self.dropped += max(0, int(gap / self.expected_interval) - 1)
+        self.frame_times.append(now)
+
+    def inference(self):
+        """Call once per frame that went through the model"""
+        if self.enabled:
+            self.inference_times.append(time.perf_counter())
+
+    def drop(self):
+        if self.enabled:
+            self.dropped += 1
+
+    @staticmethod
+    def _fps(times):
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def _sample_process(self):
+        now = time.perf_counter()
+        if self.process is None or now - self.last_process_sample < 1.0:
+            return
+        self.last_process_sample = now
+        cpu = self.process.cpu_percent(None)
+        rss = self.process.memory_info().rss / 2**20
+        self.process_stats = f"CPU {cpu:.0f}%  RSS {rss:.0f} MB"
+
+    def lines(self):
+        self._sample_process()
+        lines = [f"capture {self._fps(self.frame_times):.1f} fps  "
+                 f"inference {self._fps(self.inference_times):.1f} fps  "
+                 f"dropped {self.dropped}"]
+        for name, samples in self.timings.items():
+            if samples:
+                ms = np.asarray(samples) * 1000
+                lines.append(f"{name:<10} p50 {np.percentile(ms, 50):6.1f} ms  "
+                             f"p95 {np.percentile(ms, 95):6.1f} ms")
+        if self.process_stats:
+            lines.append(self.process_stats)
+        if self.profiler is not None and self.profiler.is_alive():
+            lines.append("REC profiling frame loop")
+        return lines
+
+    def draw(self, frame):
+        """Draw the HUD onto a BGR frame in place"""
+        if not self.enabled:
+            return frame
+        lines = self.lines()
+        height = 22 * len(lines) + 10
+        overlay = frame[:height, :430]
+        overlay[:] = (overlay * 0.4).astype(frame.dtype)  # darken behind the text
+        for i, line in enumerate(lines):
+            cv2.putText(frame, line, (8, 22 + 22 * i), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, (0, 255, 0), 1, cv2.LINE_AA)
+        return frame
+
+    def record_profile(self, seconds=10, path=None):
+        """Sample the calling thread (the GUI thread) for a few seconds in the background"""
+        if self.profiler is not None and self.profiler.is_alive():
+            return None
+        path = path or f"beabled_profile_{time.strftime('%Y%m%d_%H%M%S')}.folded"
+        self.profiler = StackSampler(threading.get_ident(), seconds, path)
+        self.profiler.start()
+        return path
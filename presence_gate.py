@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class PresenceGate:
+    """Cheap motion gate in front of MediaPipe hand detection.
+
+    Each frame is shrunk to a small grayscale thumbnail and differenced
+    against the previous one. Hand detection wakes up after `wake_frames`
+    consecutive frames with motion and goes back to sleep only after
+    `idle_frames` consecutive still frames, so it doesn't flap on/off during
+    a pause mid-sentence. With `idle_seconds` it sleeps after that much
+    stillness instead, whatever rate the frames arrive at. Callers report
+    found hands through keep_awake(), which holds the gate open while someone
+    is holding a sign still.
+    """
+
+    def __init__(self, width=64, pixel_threshold=15, min_motion=0.01, wake_frames=2, idle_frames=45,
+                 idle_seconds=None):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_motion = min_motion  # fraction of thumbnail pixels that must change
+        self.wake_frames = wake_frames
+        self.idle_frames = idle_frames
+        self.idle_seconds = idle_seconds
+        self.previous = None
+        self.awake = True
+        self.moving = 0
+        self.still = 0
+        self.last_motion = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {'frames': 0, 'gated': 0, 'wakeups': 0, 'gate_s': 0.0, 'detect_s': 0.0, 'detected': 0}
+
+    def motion(self, frame):
+        """Fraction of thumbnail pixels that changed since the previous frame"""
+        h, w = frame.shape[:2]
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (self.width, max(1, h * self.width // w)), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (3, 3), 0)  # sensor noise shouldn't count as motion
+        previous, self.previous = self.previous, small
+        if previous is None or previous.shape != small.shape:
+            return 1.0
+        return np.count_nonzero(cv2.absdiff(small, previous) > self.pixel_threshold) / small.size
+
+    def active(self, frame):
+        """True if hand detection should run on this frame"""
+        t0 = time.perf_counter()
+        if self.motion(frame) >= self.min_motion:
+            self.moving += 1
+            self.still = 0
+            self.last_motion = time.monotonic()
+        else:
+            self.moving = 0
+            self.still += 1
+
+        if self.awake and self.idle():
+            self.awake = False
+        elif not self.awake and self.moving >= self.wake_frames:
+            self.awake = True
+            with self.lock:
+                self.counts['wakeups'] += 1
+
+        with self.lock:
+            self.counts['frames'] += 1
+            self.counts['gated'] += not self.awake
+            self.counts['gate_s'] += time.perf_counter() - t0
+        return self.awake
+
+    def idle(self):
+        """Still for long enough to go to sleep"""
+        if self.idle_seconds is not None:
+            return self.still > 0 and time.monotonic() - self.last_motion >= self.idle_seconds
+        return self.still >= self.idle_frames
+
+    def keep_awake(self):
+        """A hand was found: stay active even if it is held still"""
+        self.still = 0
+        self.last_motion = time.monotonic()
+
+    def record_detection(self, seconds):
+        """Time spent in hand detection for a frame that passed, used to estimate the saving"""
+        with self.lock:
+            self.counts['detected'] += 1
+            self.counts['detect_s'] += seconds
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        return summarise(counts)
+
+
+def summarise(counts):
+    frames, gated, detected = counts['frames'], counts['gated'], counts['detected']
+    gate_ms = counts['gate_s'] / frames * 1000 if frames else 0.0
+    detect_ms = counts['detect_s'] / detected * 1000 if detected else 0.0
+    # Gated frames would each have paid detect_ms; every frame pays gate_ms
+    saved_ms = gated * detect_ms - frames * gate_ms
+    return {
+        'frames': frames, 'gated': gated, 'wakeups': counts['wakeups'],
+        'gated_fraction': round(gated / frames, 3) if frames else 0.0,
+        'gate_ms': round(gate_ms, 3), 'detect_ms': round(detect_ms, 2),
+        'detect_time_saved_s': round(saved_ms / 1000, 2),
+        'detect_time_saved_fraction': round(saved_ms / (frames * detect_ms), 3) if frames and detect_ms else 0.0,
+    }
+
+
+class SessionGates:
+    """One PresenceGate per client for the server, least recently used evicted first"""
+
+    def __init__(self, max_sessions=10000, **gate_kwargs):
+        self.max_sessions = max_sessions
+        self.gate_kwargs = gate_kwargs
+        self.gates = OrderedDict()
+        self.retired = dict.fromkeys(PresenceGate(**gate_kwargs).counts, 0)  # counts of evicted gates
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        with self.lock:
+            gate = self.gates.get(session_id)
+            if gate is None:
+                gate = self.gates[session_id] = PresenceGate(**self.gate_kwargs)
+                if len(self.gates) > self.max_sessions:
+                    _, old = self.gates.popitem(last=False)
+                    for key, value in old.counts.items():
+                        self.retired[key] += value
+            else:
+                self.gates.move_to_end(session_id)
+            return gate
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.retired)
+            gates = list(self.gates.values())
+        for gate in gates:
+            with gate.lock:
+                for key, value in gate.counts.items():
+                    counts[key] += value
+        stats = summarise(counts)
+        stats['sessions'] = len(gates)
+        return stats
@@ -0,0 +1,82 @@
+import threading
+import cv2
+import numpy as np
+
+REJECT_REASONS = ('low_handedness', 'too_small', 'truncated', 'blurry')
+
+
+def landmark_array(hand_landmarks):
+    """MediaPipe landmarks or an (21, 2|3) array -> (21, 2) float array of normalised x, y"""
+    if hasattr(hand_landmarks, 'landmark'):
+        return np.array([[lm.x, lm.y] for lm in hand_landmarks.landmark], dtype=np.float32)
+    return np.asarray(hand_landmarks, dtype=np.float32)[:, :2]
+
+
+def blur_score(crop, size=64):
+    """Variance of the Laplacian on a small grayscale copy; low means blurry"""
+    gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class QualityGate:
+    """Cheap checks between cropping and inference.
+
+    Crops that would almost certainly end below the confidence threshold
+    (blurry, tiny, cut off by the frame edge, unsure handedness) are rejected
+    before the classifier runs. Checks run cheapest first and the first
+    failing one is counted, so the counters show where compute is saved.
+    """
+
+    def __init__(self, min_handedness=0.8, min_box=48, edge_tolerance=0.0, min_blur=40.0):
+        self.min_handedness = min_handedness
+        self.min_box = min_box
+        self.edge_tolerance = edge_tolerance
+        self.min_blur = min_blur
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(REJECT_REASONS + ('passed',), 0)
+
+    def check(self, crop, landmarks=None, handedness_score=None, box_size=None):
+        """Returns None if the crop should be classified, otherwise the reject reason.
+
+        `box_size` is the hand box side in original frame pixels; it defaults
+        to the crop's shorter side, which is right unless the crop was resized.
+        """
+        reason = self._reason(crop, landmarks, handedness_score, box_size)
+        with self.lock:
+            self.counts[reason or 'passed'] += 1
+        return reason
+
+    def _reason(self, crop, landmarks, handedness_score, box_size):
+        if handedness_score is not None and handedness_score < self.min_handedness:
+            return 'low_handedness'
+        if box_size is None:
+            box_size = min(crop.shape[:2])
+        if box_size < self.min_box:
+            return 'too_small'
+        if landmarks is not None:
+            # MediaPipe extrapolates landmarks past the border for a partly visible hand,
+            # while the crop itself gets clamped to the frame
+            points = landmark_array(landmarks)
+            low, high = -self.edge_tolerance, 1 + self.edge_tolerance
+            if (points < low).any() or (points > high).any():
+                return 'truncated'
+        if blur_score(crop) < self.min_blur:
+            return 'blurry'
+        return None
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        rejected = total - counts['passed']
+        counts['total'] = total
+        counts['rejected_fraction'] = round(rejected / total, 3) if total else 0.0
+        return counts
+
+
+def handedness_score(results, index):
+    """Handedness classification score for the index-th detected hand, if available"""
+    if not getattr(results, 'multi_handedness', None) or index >= len(results.multi_handedness):
+        return None
+    return results.multi_handedness[index].classification[0].score
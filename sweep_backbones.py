@@ -0,0 +1,332 @@
+"""Accuracy/latency sweep over smaller backbones and input sizes.
+
+Usage:
+    python sweep_backbones.py --data data --out sweep --distill
+
+Every configuration is trained the same way as cnn2.py (frozen ImageNet
+backbone, GAP + dropout + softmax head). With --distill the current
+gesture_mobilenet_advanced2.h5 is used as a teacher and the student is
+trained on a mix of hard labels and the teacher's softened predictions.
+Each trained model is timed on CPU at batch size 1 in a separate process
+(so --threads applies to the timing only, training keeps TensorFlow's default
+thread pools and any GPU), the Pareto frontier
+(higher accuracy, lower latency) is printed, and the fastest model within
+--max-accuracy-drop of the best one is copied to <out>/selected/ together
+with its class_indices.json.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from tensorflow.keras.applications import MobileNetV2, MobileNetV3Small
+from tensorflow.keras.models import Model
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout, Input, Rescaling
+from tensorflow.keras.optimizers import Adam
+
+# (backbone, alpha, input size). MobileNetV3Small only ships ImageNet
+# weights for alpha 0.75 and 1.0.
+DEFAULT_CONFIGS = [
+    ('mobilenet_v2', 1.0, 160),
+    ('mobilenet_v2', 1.0, 128),
+    ('mobilenet_v2', 0.5, 160),
+    ('mobilenet_v2', 0.5, 128),
+    ('mobilenet_v2', 0.5, 96),
+    ('mobilenet_v2', 0.35, 128),
+    ('mobilenet_v2', 0.35, 96),
+    ('mobilenet_v3_small', 1.0, 128),
+    ('mobilenet_v3_small', 0.75, 128),
+    ('mobilenet_v3_small', 0.75, 96),
+]
+
+
+def config_name(backbone, alpha, size):
+    return f"{backbone}_a{alpha:g}_{size}"
+
+
+def build_model(backbone, alpha, size, num_classes):
+    input_shape = (size, size, 3)
+    if backbone == 'mobilenet_v2':
+        base_model = MobileNetV2(input_shape=input_shape, alpha=alpha,
+                                 include_top=False, weights='imagenet')
+    elif backbone == 'mobilenet_v3_small':
+        # Callers feed [0, 1] like the rest of the repo; without its built-in
+        # preprocessing (which expects [0, 255]) this backbone wants [-1, 1]
+        inputs = Input(shape=input_shape)
+        base_model = MobileNetV3Small(input_shape=input_shape, alpha=alpha,
+                                      input_tensor=Rescaling(2.0, offset=-1.0)(inputs),
+                                      include_top=False, weights='imagenet',
+                                      include_preprocessing=False)
+    else:
+        raise ValueError(f"Unknown backbone: {backbone}")
+    base_model.trainable = False
+
+    x = base_model.output
+    x = GlobalAveragePooling2D()(x)
+    x = Dropout(0.5)(x)
+    predictions = Dense(num_classes, activation='softmax')(x)
+    return Model(inputs=base_model.input, outputs=predictions)
+
+
+def make_generators(data_dir, size, batch_size):
+    train_datagen = ImageDataGenerator(
+        rescale=1./255,
+        validation_split=0.2,
+        rotation_range=20,
+        zoom_range=0.15,
+        width_shift_range=0.2,
+        height_shift_range=0.2,
+        horizontal_flip=True
+    )
+    # Validation images are only rescaled so the accuracy numbers are comparable
+    val_datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
+
+    train_gen = train_datagen.flow_from_directory(
+        data_dir, target_size=(size, size), batch_size=batch_size,
+        class_mode='categorical', subset='training'
+    )
+    val_gen = val_datagen.flow_from_directory(
+        data_dir, target_size=(size, size), batch_size=batch_size,
+        class_mode='categorical', subset='validation', shuffle=False
+    )
+    return train_gen, val_gen
+
+
+class Distiller(tf.keras.Model):
+    """Train a student on hard labels plus a teacher's softened outputs"""
+
+    def __init__(self, student, teacher, teacher_index, temperature=4.0, alpha=0.5):
+        super().__init__()
+        self.student = student
+        self.teacher = teacher
+        self.teacher_index = tf.constant(teacher_index, dtype=tf.int32)
+        self.teacher_size = teacher.input_shape[1:3]
+        self.temperature = temperature
+        self.alpha = alpha
+        self.loss_tracker = tf.keras.metrics.Mean(name='loss')
+        self.acc_tracker = tf.keras.metrics.CategoricalAccuracy(name='accuracy')
+
+    @property
+    def metrics(self):
+        return [self.loss_tracker, self.acc_tracker]
+
+    def _teacher_logits(self, x):
+        # The teacher may know extra labels; keep only the student's classes, in its order
+        probs = self.teacher(tf.image.resize(x, self.teacher_size), training=False)
+        probs = tf.gather(probs, self.teacher_index, axis=1)
+        return tf.math.log(probs + 1e-7)
+
+    def train_step(self, data):
+        x, y = data
+        soft_targets = tf.nn.softmax(self._teacher_logits(x) / self.temperature)
+        with tf.GradientTape() as tape:
+            probs = self.student(x, training=True)
+            hard_loss = tf.keras.losses.categorical_crossentropy(y, probs)
+            soft_probs = tf.nn.softmax(tf.math.log(probs + 1e-7) / self.temperature)
+            soft_loss = tf.keras.losses.kl_divergence(soft_targets, soft_probs)
+            loss = tf.reduce_mean(self.alpha * hard_loss +
+                                  (1 - self.alpha) * soft_loss * self.temperature ** 2)
+        grads = tape.gradient(loss, self.student.trainable_variables)
+        self.optimizer.apply_gradients(zip(grads, self.student.trainable_variables))
+        self.loss_tracker.update_state(loss)
+        self.acc_tracker.update_state(y, probs)
+        return {m.name: m.result() for m in self.metrics}
+
+    def test_step(self, data):
+        x, y = data
+        probs = self.student(x, training=False)
+        self.loss_tracker.update_state(tf.reduce_mean(
+            tf.keras.losses.categorical_crossentropy(y, probs)))
+        self.acc_tracker.update_state(y, probs)
+        return {m.name: m.result() for m in self.metrics}
+
+
+def load_teacher(model_path, labels_path, class_indices):
+    teacher = tf.keras.models.load_model(model_path)
+    teacher.trainable = False
+    with open(labels_path) as f:
+        teacher_indices = json.load(f)
+    missing = [c for c in class_indices if c not in teacher_indices]
+    if missing:
+        raise ValueError(f"Teacher does not know classes: {missing}")
+    teacher_index = [teacher_indices[c] for c in sorted(class_indices, key=class_indices.get)]
+    return teacher, teacher_index
+
+
+def measure_latency(model, size, runs=200, warmup=20):
+    """Median and p90 single-image CPU latency in milliseconds"""
+    infer = tf.function(lambda x: model(x, training=False))
+    x = tf.constant(np.random.rand(1, size, size, 3).astype(np.float32))
+    for _ in range(warmup):
+        infer(x)
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        infer(x).numpy()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(timings)), float(np.percentile(timings, 90))
+
+
+def measure_latency_subprocess(model_path, size, threads):
+    """measure_latency() in a fresh process pinned to `threads` intra-op threads on CPU"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure-latency', model_path,
+         '--size', str(size), '--threads', str(threads)],
+        check=True, stdout=subprocess.PIPE, text=True
+    ).stdout
+    timing = json.loads(output.strip().splitlines()[-1])
+    return timing['latency_ms'], timing['latency_p90_ms']
+
+
+def pareto_frontier(results):
+    """Configs not beaten on both accuracy and latency by any other config"""
+    frontier = []
+    for r in results:
+        dominated = any(
+            o['val_accuracy'] >= r['val_accuracy'] and o['latency_ms'] <= r['latency_ms'] and
+            (o['val_accuracy'] > r['val_accuracy'] or o['latency_ms'] < r['latency_ms'])
+            for o in results
+        )
+        if not dominated:
+            frontier.append(r)
+    return sorted(frontier, key=lambda r: r['latency_ms'])
+
+
+def training_settings(args, teacher_args):
+    """Everything besides the config name that a cached result depends on"""
+    settings = {'data': os.path.abspath(args.data), 'epochs': args.epochs,
+                'batch_size': args.batch_size, 'distilled': bool(teacher_args)}
+    if teacher_args:
+        settings.update(teacher=os.path.abspath(teacher_args[0]),
+                        temperature=args.temperature, distill_alpha=args.distill_alpha)
+    return settings
+
+
+def run_config(args, backbone, alpha, size, teacher_args):
+    name = config_name(backbone, alpha, size)
+    run_dir = os.path.join(args.out, name)
+    result_path = os.path.join(run_dir, 'result.json')
+    settings = training_settings(args, teacher_args)
+    if os.path.exists(result_path):
+        with open(result_path) as f:
+            result = json.load(f)
+        if result.get('settings') == settings:
+            print(f"⏭️  {name}: already trained, reusing result")
+            return result
+        print(f"🔁 {name}: trained with other settings, training again")
+    os.makedirs(run_dir, exist_ok=True)
+
+    print(f"\n🔧 Training {name}")
+    train_gen, val_gen = make_generators(args.data, size, args.batch_size)
+    student = build_model(backbone, alpha, size, train_gen.num_classes)
+
+    if teacher_args:
+        teacher, teacher_index = load_teacher(*teacher_args, train_gen.class_indices)
+        trainer = Distiller(student, teacher, teacher_index,
+                            temperature=args.temperature, alpha=args.distill_alpha)
+        trainer.compile(optimizer=Adam(learning_rate=0.001))
+    else:
+        trainer = student
+        trainer.compile(optimizer=Adam(learning_rate=0.001),
+                        loss='categorical_crossentropy', metrics=['accuracy'])
+    trainer.fit(train_gen, validation_data=val_gen, epochs=args.epochs)
+
+    student.compile(loss='categorical_crossentropy', metrics=['accuracy'])
+    _, val_accuracy = student.evaluate(val_gen, verbose=0)
+    model_path = os.path.join(run_dir, 'model.h5')
+    student.save(model_path)
+    latency_ms, latency_p90_ms = measure_latency_subprocess(model_path, size, args.threads)
+    with open(os.path.join(run_dir, 'class_indices.json'), 'w') as f:
+        json.dump(train_gen.class_indices, f)
+
+    result = {
+        'name': name, 'backbone': backbone, 'alpha': alpha, 'input_size': size,
+        'params': int(student.count_params()), 'distilled': bool(teacher_args),
+        'settings': settings,
+        'val_accuracy': float(val_accuracy),
+        'latency_ms': latency_ms, 'latency_p90_ms': latency_p90_ms
+    }
+    with open(result_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ {name}: acc={val_accuracy:.3f} latency={latency_ms:.2f}ms")
+    return result
+
+
+def parse_configs(spec):
+    configs = []
+    for item in spec.split(','):
+        backbone, alpha, size = item.split(':')
+        configs.append((backbone, float(alpha), int(size)))
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep backbones/input sizes for accuracy vs latency")
+    parser.add_argument('--data', default='data')
+    parser.add_argument('--out', default='sweep')
+    parser.add_argument('--configs', help="comma list of backbone:alpha:size, "
+                                          "e.g. mobilenet_v2:0.5:128,mobilenet_v3_small:0.75:96")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--distill', action='store_true')
+    parser.add_argument('--teacher', default='gesture_mobilenet_advanced2.h5')
+    parser.add_argument('--teacher-labels', default='class_indices.json')
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--distill-alpha', type=float, default=0.5,
+                        help="weight of the hard-label loss when distilling")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.02,
+                        help="pick the fastest model within this much of the best accuracy")
+    parser.add_argument('--threads', type=int, default=1,
+                        help="intra-op threads used for latency measurement")
+    parser.add_argument('--measure-latency', metavar='MODEL', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_latency:
+        # Latency is measured on CPU only, the way the desktop apps and server run
+        tf.config.set_visible_devices([], 'GPU')
+        tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        model = tf.keras.models.load_model(args.measure_latency, compile=False)
+        latency_ms, latency_p90_ms = measure_latency(model, args.size)
+        print(json.dumps({'latency_ms': latency_ms, 'latency_p90_ms': latency_p90_ms}))
+        return
+
+    os.makedirs(args.out, exist_ok=True)
+    configs = parse_configs(args.configs) if args.configs else DEFAULT_CONFIGS
+    teacher_args = (args.teacher, args.teacher_labels) if args.distill else None
+
+    results = []
+    for backbone, alpha, size in configs:
+        results.append(run_config(args, backbone, alpha, size, teacher_args))
+        tf.keras.backend.clear_session()
+
+    frontier = pareto_frontier(results)
+    best_accuracy = max(r['val_accuracy'] for r in results)
+    candidates = [r for r in frontier if r['val_accuracy'] >= best_accuracy - args.max_accuracy_drop]
+    chosen = min(candidates, key=lambda r: r['latency_ms'])
+
+    print("\n📈 Pareto frontier (fastest first):")
+    for r in frontier:
+        marker = '  <- selected' if r is chosen else ''
+        print(f"  {r['name']:<28} acc={r['val_accuracy']:.3f}  "
+              f"latency={r['latency_ms']:.2f}ms (p90 {r['latency_p90_ms']:.2f}ms){marker}")
+
+    selected_dir = os.path.join(args.out, 'selected')
+    os.makedirs(selected_dir, exist_ok=True)
+    for filename in ('model.h5', 'class_indices.json', 'result.json'):
+        shutil.copy(os.path.join(args.out, chosen['name'], filename), selected_dir)
+    with open(os.path.join(args.out, 'sweep.json'), 'w') as f:
+        json.dump({'results': results, 'frontier': [r['name'] for r in frontier],
+                   'selected': chosen['name']}, f, indent=2)
+    print(f"✅ Saved {chosen['name']} to {selected_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,32 @@
 import json
+import os
 import cv2
 import numpy as np
-import tensorflow as tf
-import mediapipe as mp
 import time
 
+from enrollment import EmbeddingIndex, EnrolledClassifier, index_path
+from inference_client import DaemonConnection, draw_hand
+from presence_gate import PresenceGate
+from quality_gate import QualityGate, handedness_score
+
 class ASLDetector:
-    def __init__(self):
+    def __init__(self, use_daemon=True):
+        self.daemon = DaemonConnection(self.load_in_process, use_daemon=use_daemon)
+        
+        # Hand detection only runs while there is motion in front of the camera
+        self.presence_gate = PresenceGate()
+        
+        # Caption system
+        self.current_caption = ""
+        self.last_caption_time = 0
+        self.caption_timeout = 2.0
+        self.caption_history = []
+        self.img_size = (160, 160)
+        
+    def load_in_process(self):
+        import tensorflow as tf
+        import mediapipe as mp
+        
         self.model = tf.keras.models.load_model('gesture_mobilenet_advanced2.h5')
         with open('class_indices.json') as f:
             self.class_indices = json.load(f)
@@ -16,25 +36,67 @@ class ASLDetector:
         self.mp_hands = mp.solutions.hands
         self.hands = self.mp_hands.Hands(max_num_hands=1)
         self.mp_draw = mp.solutions.drawing_utils
+        self.quality_gate = QualityGate()
         
-        # Caption system
-        self.current_caption = ""
-        self.last_caption_time = 0
-        self.caption_timeout = 2.0
-        self.caption_history = []
-        self.img_size = (160, 160)
+        # Personal signs recorded with enrollment.py, matched next to the softmax head
+        enrollments = None
+        user = os.environ.get('BEABLED_USER')
+        if user and os.path.exists(index_path(user)):
+            enrollments = EmbeddingIndex.load(index_path(user))
+        self.classifier = EnrolledClassifier(self.model, self.idx_to_class, enrollments)
+        
+    def update_caption(self, label):
+        if label != self.current_caption:
+            self.current_caption = label
+            self.caption_history.append(label)
+            if len(self.caption_history) > 5:
+                self.caption_history.pop(0)
+        
+        self.last_caption_time = time.time()
         
     def process_frame(self, frame):
         frame = cv2.flip(frame, 1)
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        result = self.hands.process(image_rgb)
         
         # Clear caption if timeout has passed
         if time.time() - self.last_caption_time > self.caption_timeout:
             self.current_caption = ""
+        
+        if self.daemon.available and self.presence_gate.active(frame):
+            if self.daemon.remote:
+                found = self.process_remote(frame)
+            else:
+                found = self.process_local(frame)
+            if found:
+                self.presence_gate.keep_awake()
+        return self.add_caption_bar(frame)
+    
+    def process_remote(self, frame):
+        """Returns True if a hand was found"""
+        t0 = time.perf_counter()
+        hands = self.daemon.process_frame(frame)
+        if hands is None:
+            return False
+        self.presence_gate.record_detection(time.perf_counter() - t0)  # includes the daemon's classify
+        for hand in hands:
+            x_min, y_min, x_max, y_max = hand['bbox']
+            if hand['rejected']:
+                cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 0, 255), 2)
+                continue
+            if hand['label']:
+                self.update_caption(hand['label'])
+            draw_hand(frame, hand['landmarks'])
+            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
+        return bool(hands)
+    
+    def process_local(self, frame):
+        """Returns True if a hand was found"""
+        t0 = time.perf_counter()
+        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        result = self.hands.process(image_rgb)
+        self.presence_gate.record_detection(time.perf_counter() - t0)
             
         if result.multi_hand_landmarks:
-            for hand_landmarks in result.multi_hand_landmarks:
+            for i, hand_landmarks in enumerate(result.multi_hand_landmarks):
                 h, w, _ = frame.shape
                 x_min = int(min([lm.x for lm in hand_landmarks.landmark]) * w) - 20
                 y_min = int(min([lm.y for lm in hand_landmarks.landmark]) * h) - 20
@@ -48,29 +110,22 @@ class ASLDetector:
                 if cropped_hand.size == 0:
                     continue
 
+                # Skip the classifier for crops it would not be confident on anyway
+                if self.quality_gate.check(cropped_hand, hand_landmarks, handedness_score(result, i)):
+                    cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 0, 255), 2)
+                    continue
+
                 img = cv2.resize(cropped_hand, self.img_size)
                 img = img / 255.0
                 img = np.expand_dims(img, axis=0)
 
-                preds = self.model.predict(img, verbose=0)
-                class_idx = np.argmax(preds)
-                confidence = preds[0][class_idx]
-
-                if class_idx in self.idx_to_class and confidence > 0.7:
-                    label = self.idx_to_class[class_idx]
-                    
-                    if label != self.current_caption:
-                        self.current_caption = label
-                        self.caption_history.append(label)
-                        if len(self.caption_history) > 5:
-                            self.caption_history.pop(0)
-                    
-                    self.last_caption_time = time.time()
+                label, confidence = self.classifier.classify(img)
+                if label:
+                    self.update_caption(label)
                     
                 self.mp_draw.draw_landmarks(frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
                 cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
-                
-        return self.add_caption_bar(frame)
+        return bool(result.multi_hand_landmarks)
     
     def add_caption_bar(self, frame):
         # Draw caption bar at bottom
@@ -111,6 +166,11 @@ def main():
             
     cap.release()
     cv2.destroyAllWindows()
+    print(f"Presence gate: {detector.presence_gate.stats()}")
+    if detector.daemon.remote:
+        detector.daemon.close()
+    elif detector.daemon.available:
+        print(f"Quality gate: {detector.quality_gate.stats()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
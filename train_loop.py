@@ -0,0 +1,176 @@
+"""Resumable, throughput-oriented training loop for cnn2.py (CHECKPOINT_DIR=...).
+
+Train steps are compiled with XLA. Batches are loaded on one background
+thread so image decoding overlaps the step. Checkpoints (model, optimizer
+state, epoch and step within the epoch) are written every `checkpoint_every`
+steps and at the end of each epoch. Data order and augmentation are derived
+from (seed, epoch, step), so a resumed run sees exactly the batches the
+interrupted run would have seen.
+
+An optional second phase unfreezes the top MobileNetV2 blocks and keeps
+training at a lower learning rate. Per-epoch metrics, including images/s,
+are printed and appended to <checkpoint_dir>/train_log.jsonl.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+MOBILENETV2_BLOCKS = 16
+
+
+def unfreeze_top_blocks(base_model, blocks):
+    """Make the last `blocks` inverted-residual blocks and the final conv trainable.
+
+    BatchNorm layers stay frozen (and so in inference mode), the usual
+    practice when fine-tuning on a small dataset.
+    """
+    first = f"block_{MOBILENETV2_BLOCKS + 1 - blocks}_"
+    trainable = False
+    for layer in base_model.layers:
+        trainable = trainable or layer.name.startswith(first)
+        layer.trainable = trainable and not isinstance(layer, tf.keras.layers.BatchNormalization)
+
+
+def freeze(base_model):
+    for layer in base_model.layers:
+        layer.trainable = False
+
+
+def _batch_seed(seed, epoch, step):
+    return (seed * 1_000_003 + epoch * 10_007 + step) % 2**32
+
+
+class BatchPrefetcher(threading.Thread):
+    """Loads one epoch's batches in order, starting at `start_step`.
+
+    Keras generators augment with the global numpy RNG, so it is reseeded
+    per batch here, and only this thread touches the generator.
+    """
+
+    def __init__(self, generator, epoch, start_step, seed, depth=8):
+        super().__init__(daemon=True)
+        self.generator = generator
+        self.epoch = epoch
+        self.start_step = start_step
+        self.seed = seed
+        self.queue = queue.Queue(maxsize=depth)
+
+    def run(self):
+        gen = self.generator
+        try:
+            gen.index_array = np.random.RandomState(self.seed + self.epoch).permutation(gen.n)
+            for step in range(self.start_step, len(gen)):
+                np.random.seed(_batch_seed(self.seed, self.epoch, step))
+                self.queue.put(gen[step])
+        except Exception as e:
+            self.queue.put(e)
+
+    def get(self):
+        batch = self.queue.get()
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+
+def train_resumable(model, base_model, train_gen, val_gen, checkpoint_dir, epochs=10,
+                    fine_tune_epochs=0, fine_tune_blocks=3, learning_rate=1e-3,
+                    fine_tune_learning_rate=1e-5, checkpoint_every=200, jit_compile=True, seed=0):
+    total_epochs = epochs + fine_tune_epochs
+    steps = len(train_gen)
+    epoch_var = tf.Variable(0, dtype=tf.int64, trainable=False)
+    step_var = tf.Variable(0, dtype=tf.int64, trainable=False)
+    optimizers = {
+        False: tf.keras.optimizers.Adam(learning_rate),
+        True: tf.keras.optimizers.Adam(fine_tune_learning_rate),
+    }
+
+    # Create every optimizer slot before restoring so nothing is restored lazily
+    if fine_tune_epochs:
+        unfreeze_top_blocks(base_model, fine_tune_blocks)
+        optimizers[True].build(model.trainable_variables)
+    freeze(base_model)
+    optimizers[False].build(model.trainable_variables)
+
+    checkpoint = tf.train.Checkpoint(model=model, optimizer=optimizers[False],
+                                     fine_tune_optimizer=optimizers[True],
+                                     epoch=epoch_var, step=step_var)
+    manager = tf.train.CheckpointManager(checkpoint, checkpoint_dir, max_to_keep=3)
+    if manager.latest_checkpoint:
+        checkpoint.restore(manager.latest_checkpoint)
+        print(f"⏩ Resuming from {manager.latest_checkpoint}: epoch {int(epoch_var) + 1}, "
+              f"step {int(step_var)}/{steps}")
+
+    def make_train_step(optimizer):
+        variables = model.trainable_variables
+
+        @tf.function(jit_compile=jit_compile)
+        def train_step(x, y):
+            with tf.GradientTape() as tape:
+                probs = model(x, training=True)
+                loss = tf.reduce_mean(tf.keras.losses.categorical_crossentropy(y, probs))
+            optimizer.apply_gradients(zip(tape.gradient(loss, variables), variables))
+            correct = tf.reduce_sum(tf.cast(tf.equal(tf.argmax(probs, 1), tf.argmax(y, 1)), tf.float32))
+            return loss, correct
+        return train_step
+
+    @tf.function(jit_compile=jit_compile)
+    def eval_step(x, y):
+        probs = model(x, training=False)
+        loss = tf.reduce_sum(tf.keras.losses.categorical_crossentropy(y, probs))
+        correct = tf.reduce_sum(tf.cast(tf.equal(tf.argmax(probs, 1), tf.argmax(y, 1)), tf.float32))
+        return loss, correct
+
+    train_step, phase = None, None
+    for epoch in range(int(epoch_var), total_epochs):
+        fine_tune = epoch >= epochs
+        if fine_tune != phase:
+            if fine_tune:
+                unfreeze_top_blocks(base_model, fine_tune_blocks)
+            else:
+                freeze(base_model)
+            train_step, phase = make_train_step(optimizers[fine_tune]), fine_tune
+
+        start_step = int(step_var)
+        prefetcher = BatchPrefetcher(train_gen, epoch, start_step, seed)
+        prefetcher.start()
+        images, loss_sum, correct_sum = 0, 0.0, 0.0
+        t0 = time.perf_counter()
+        for step in range(start_step, steps):
+            x, y = prefetcher.get()
+            loss, correct = train_step(x, y)
+            images += len(x)
+            loss_sum += float(loss) * len(x)
+            correct_sum += float(correct)
+            step_var.assign(step + 1)
+            if (step + 1) % checkpoint_every == 0 and step + 1 < steps:
+                manager.save()
+        train_seconds = time.perf_counter() - t0
+
+        val_loss, val_correct = 0.0, 0.0
+        for i in range(len(val_gen)):
+            x, y = val_gen[i]
+            loss, correct = eval_step(x, y)
+            val_loss += float(loss)
+            val_correct += float(correct)
+
+        epoch_var.assign(epoch + 1)
+        step_var.assign(0)
+        manager.save()
+
+        stats = {
+            'epoch': epoch + 1, 'phase': 'fine_tune' if fine_tune else 'head',
+            'loss': loss_sum / max(images, 1), 'accuracy': correct_sum / max(images, 1),
+            'val_loss': val_loss / max(val_gen.n, 1), 'val_accuracy': val_correct / max(val_gen.n, 1),
+            'images_per_second': images / train_seconds if train_seconds else 0.0,
+            'resumed_at_step': start_step,
+        }
+        print(f"Epoch {epoch + 1}/{total_epochs} [{stats['phase']}] loss {stats['loss']:.4f} "
+              f"acc {stats['accuracy']:.4f} val_loss {stats['val_loss']:.4f} "
+              f"val_acc {stats['val_accuracy']:.4f} - {stats['images_per_second']:.1f} images/s")
+        with open(os.path.join(checkpoint_dir, 'train_log.jsonl'), 'a') as f:
+            f.write(json.dumps(stats) + '\n')
@@ -2,16 +2,39 @@ import sys
 import cv2
 import numpy as np
 import json
-import tensorflow as tf
-import mediapipe as mp
+import os
+import time
+from contextlib import nullcontext
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                            QHBoxLayout, QPushButton, QLabel, QFrame)
+                            QHBoxLayout, QPushButton, QLabel, QFrame, QShortcut)
 from PyQt5.QtCore import QTimer, Qt, pyqtSignal
-from PyQt5.QtGui import QImage, QPixmap, QPainter
+from PyQt5.QtGui import QImage, QPixmap, QPainter, QKeySequence
+
+from inference_client import DaemonConnection, draw_hand
+from presence_gate import PresenceGate
+from quality_gate import QualityGate, handedness_score
+from perf_hud import PerfMonitor
+
+try:
+    from webrtc_peer import RemotePeer
+except ImportError:  # aiortc not installed: the remote pane mirrors the local feed
+    RemotePeer = None
 
 
 class ASLDetector:
-    def __init__(self):
+    def __init__(self, perf=None, use_daemon=True):
+        self.img_size = (160, 160)
+        self.current_gesture = ""
+        self.perf = perf or PerfMonitor()
+        self.daemon = DaemonConnection(self.load_in_process, use_daemon=use_daemon)
+        
+        # Hand detection only runs while there is motion in front of the camera
+        self.presence_gate = PresenceGate()
+        
+    def load_in_process(self):
+        import tensorflow as tf
+        import mediapipe as mp
+        
         self.model = tf.keras.models.load_model('gesture_mobilenet_advanced2.h5')
         with open('class_indices.json') as f:
             self.class_indices = json.load(f)
@@ -20,15 +43,27 @@ class ASLDetector:
         self.mp_hands = mp.solutions.hands
         self.hands = self.mp_hands.Hands(max_num_hands=1)
         self.mp_draw = mp.solutions.drawing_utils
-        self.img_size = (160, 160)
-        self.current_gesture = ""
+        self.quality_gate = QualityGate()
         
     def process_frame(self, frame):
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        result = self.hands.process(image_rgb)
+        if not self.daemon.available:
+            return frame
+        with self.perf.stage('presence'):
+            active = self.presence_gate.active(frame)
+        if not active:
+            return frame
+        if self.daemon.remote:
+            return self.process_remote(frame)
+        
+        t0 = time.perf_counter()
+        with self.perf.stage('mediapipe'):
+            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            result = self.hands.process(image_rgb)
+        self.presence_gate.record_detection(time.perf_counter() - t0)
         
         if result.multi_hand_landmarks:
-            for hand_landmarks in result.multi_hand_landmarks:
+            self.presence_gate.keep_awake()
+            for i, hand_landmarks in enumerate(result.multi_hand_landmarks):
                 h, w, _ = frame.shape
                 x_min = int(min([lm.x for lm in hand_landmarks.landmark]) * w) - 20
                 y_min = int(min([lm.y for lm in hand_landmarks.landmark]) * h) - 20
@@ -42,11 +77,18 @@ class ASLDetector:
                 if cropped_hand.size == 0:
                     continue
 
+                # Skip the classifier for crops it would not be confident on anyway
+                if self.quality_gate.check(cropped_hand, hand_landmarks, handedness_score(result, i)):
+                    cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 0, 255), 2)
+                    continue
+
                 img = cv2.resize(cropped_hand, self.img_size)
                 img = img / 255.0
                 img = np.expand_dims(img, axis=0)
 
-                preds = self.model.predict(img, verbose=0)
+                with self.perf.stage('keras'):
+                    preds = self.model.predict(img, verbose=0)
+                self.perf.inference()
                 class_idx = np.argmax(preds)
                 confidence = preds[0][class_idx]
 
@@ -59,11 +101,34 @@ class ASLDetector:
                 cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
         
         return frame
+    
+    def process_remote(self, frame):
+        t0 = time.perf_counter()
+        with self.perf.stage('daemon'):
+            hands = self.daemon.process_frame(frame)
+        if hands is None:
+            return frame
+        self.presence_gate.record_detection(time.perf_counter() - t0)  # includes the daemon's classify
+        if hands:
+            self.presence_gate.keep_awake()
+        
+        for hand in hands:
+            x_min, y_min, x_max, y_max = hand['bbox']
+            if hand['rejected']:
+                cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 0, 255), 2)
+                continue
+            self.perf.inference()
+            self.current_gesture = hand['label'] or ""
+            draw_hand(frame, hand['landmarks'])
+            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
+        
+        return frame
 
 class VideoWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.image = QImage()
+        self.perf = None
         self.setMinimumSize(640, 480)
         
     def set_image(self, image):
@@ -71,9 +136,10 @@ class VideoWidget(QWidget):
         self.update()
         
     def paintEvent(self, event):
-        painter = QPainter(self)
-        if not self.image.isNull():
-            painter.drawImage(self.rect(), self.image)
+        with self.perf.stage('paint') if self.perf else nullcontext():
+            painter = QPainter(self)
+            if not self.image.isNull():
+                painter.drawImage(self.rect(), self.image)
 
 class VideoCallApp(QMainWindow):
     def __init__(self):
@@ -82,7 +148,8 @@ class VideoCallApp(QMainWindow):
         self.setGeometry(100, 100, 1200, 800)
         
         # Initialize ASL detector
-        self.asl_detector = ASLDetector()
+        self.perf = PerfMonitor()
+        self.asl_detector = ASLDetector(self.perf)
         self.current_gesture = ""
         
         # Create main widgets
@@ -97,6 +164,7 @@ class VideoCallApp(QMainWindow):
         # Video displays
         self.local_video = VideoWidget()
         self.remote_video = VideoWidget()
+        self.remote_video.perf = self.perf
         
         # Gesture display
         self.gesture_label = QLabel("No gesture detected")
@@ -163,9 +231,14 @@ class VideoCallApp(QMainWindow):
         self.end_btn.clicked.connect(self.end_call)
         self.enable_asl_btn.clicked.connect(self.toggle_asl)
         
+        # F3 toggles the performance HUD, F4 records a short frame-loop profile
+        QShortcut(QKeySequence("F3"), self, self.perf.toggle)
+        QShortcut(QKeySequence("F4"), self, self.record_profile)
+        
         # State
         self.asl_enabled = False
         self.call_active = False
+        self.peer = None
         
     def toggle_asl(self):
         self.asl_enabled = not self.asl_enabled
@@ -192,9 +265,21 @@ class VideoCallApp(QMainWindow):
                 }
             """)
             self.gesture_label.setText("ASL detection disabled")
+        if self.peer is not None:
+            self.peer.asl_enabled = self.asl_enabled
+    
+    def record_profile(self):
+        path = self.perf.record_profile()
+        if path:
+            self.gesture_label.setText(f"Recording profile to {path}")
     
     def start_call(self):
         self.call_active = True
+        self.perf.reset()
+        if RemotePeer is not None:
+            # Joins BEABLED_ROOM if set, otherwise creates a room for the other side to join
+            self.peer = RemotePeer(room_id=os.environ.get('BEABLED_ROOM')).start()
+            self.peer.asl_enabled = self.asl_enabled
         self.timer.start(30)  # ~30fps
         self.start_btn.setEnabled(False)
         self.end_btn.setEnabled(True)
@@ -202,12 +287,44 @@ class VideoCallApp(QMainWindow):
     def end_call(self):
         self.call_active = False
         self.timer.stop()
+        self.hang_up()
+        self.setWindowTitle("ASL Video Call")
         self.start_btn.setEnabled(True)
         self.end_btn.setEnabled(False)
+    
+    def hang_up(self):
+        if self.peer is not None:
+            print(f"WebRTC: {self.peer.stats}")
+            self.peer.close()
+            self.peer = None
+    
+    def update_remote(self):
+        """Show the newest decoded remote frame; returns False if there is no remote peer"""
+        if self.peer is None:
+            return False
+        if self.peer.error:
+            print(f"WebRTC unavailable ({self.peer.error}), mirroring local video")
+            self.hang_up()
+            return False
+        if self.peer.ready.is_set():
+            self.setWindowTitle(f"ASL Video Call - room {self.peer.room_id} ({self.peer.state})")
+        remote = self.peer.latest()
+        if remote is not None:
+            rgb_image, _ = remote
+            h, w, ch = rgb_image.shape
+            self.remote_video.set_image(QImage(rgb_image.data, w, h, ch * w, QImage.Format_RGB888))
+        return True
         
     def update_frame(self):
-        ret, frame = self.capture.read()
-        if ret:
+        self.perf.frame()
+        with self.perf.stage('capture'):
+            ret, frame = self.capture.read()
+        if not ret:
+            self.perf.drop()
+        else:
+            if self.peer is not None:
+                self.peer.send(frame.copy())  # ASL draws on frame below
+            
             # Process frame for ASL if enabled
             if self.asl_enabled:
                 processed_frame = self.asl_detector.process_frame(frame)
@@ -216,19 +333,28 @@ class VideoCallApp(QMainWindow):
             else:
                 processed_frame = frame
             
+            self.perf.draw(processed_frame)
+            
             # Convert to QImage and display
-            rgb_image = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_image.shape
-            bytes_per_line = ch * w
-            qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
+            with self.perf.stage('convert'):
+                rgb_image = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
+                h, w, ch = rgb_image.shape
+                bytes_per_line = ch * w
+                qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
             self.local_video.set_image(qt_image)
             
-            # For demo purposes, just mirror the local video as remote
-            # In a real app, this would be the actual remote stream
-            self.remote_video.set_image(qt_image)
+            # Without a WebRTC peer, mirror the local video as remote
+            if not self.update_remote():
+                self.remote_video.set_image(qt_image)
     
     def closeEvent(self, event):
         self.capture.release()
+        self.hang_up()
+        print(f"Presence gate: {self.asl_detector.presence_gate.stats()}")
+        if self.asl_detector.daemon.remote:
+            self.asl_detector.daemon.close()
+        elif self.asl_detector.daemon.available:
+            print(f"Quality gate: {self.asl_detector.quality_gate.stats()}")
         event.accept()
 
 if __name__ == "__main__":
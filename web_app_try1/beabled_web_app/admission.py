@@ -0,0 +1,150 @@
+"""Admission control and load-based degradation for recognition requests.
+
+Every recognition request first asks the controller for admission
+(per-session and global token buckets). Admitted requests are served at a
+degradation tier picked from the current utilisation estimate, i.e. the
+admitted request rate over the last second times the smoothed service time:
+
+    full     normal pipeline
+    reduced  frames are downscaled before hand detection
+    skip     only every other frame per session is recognised, the rest
+             reuse the session's last result
+    cheap    the fast fallback model is used (if loaded) and only every
+             third frame per session is recognised
+
+Work that is still queued when its deadline passes is dropped instead of
+being finished late.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+TIERS = ('full', 'reduced', 'skip', 'cheap')
+FULL, REDUCED, SKIP, CHEAP = range(len(TIERS))
+
+# Recognise 1 in N frames per session at each tier
+TIER_STRIDE = {FULL: 1, REDUCED: 1, SKIP: 2, CHEAP: 3}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class Session:
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.frames = 0
+        self.last_result = None
+
+
+class AdmissionController:
+    def __init__(self, global_rate=50.0, global_burst=50, session_rate=5.0, session_burst=5,
+                 deadline_ms=500, tier_thresholds=(0.7, 0.9, 1.2), max_sessions=10000):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.deadline = deadline_ms / 1000.0
+        self.tier_thresholds = tier_thresholds
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()  # LRU so abandoned sessions cannot grow without bound
+        self.admitted = deque()
+        self.service_time = 0.0
+        self.lock = threading.Lock()
+        self.stats = {'admitted': 0, 'rate_limited_session': 0, 'rate_limited_global': 0,
+                      'dropped_deadline': 0, 'skipped': 0,
+                      'served_by_tier': {name: 0 for name in TIERS}}
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = Session(self.session_rate, self.session_burst)
+            self.sessions[session_id] = session
+            if len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(session_id)
+        return session
+
+    def admit(self, session_id):
+        """Returns None if admitted, otherwise the reason the request was refused"""
+        now = time.monotonic()
+        with self.lock:
+            if not self._session(session_id).bucket.take(now):
+                self.stats['rate_limited_session'] += 1
+                return 'session rate limit'
+            if not self.global_bucket.take(now):
+                self.stats['rate_limited_global'] += 1
+                return 'server busy'
+            self.admitted.append(now)
+            self.stats['admitted'] += 1
+        return None
+
+    def utilisation(self):
+        now = time.monotonic()
+        with self.lock:
+            while self.admitted and now - self.admitted[0] > 1.0:
+                self.admitted.popleft()
+            return len(self.admitted) * self.service_time
+
+    def tier(self):
+        load = self.utilisation()
+        for tier, threshold in enumerate(self.tier_thresholds):
+            if load < threshold:
+                return tier
+        return CHEAP
+
+    def should_skip(self, session_id, tier):
+        """True if this frame should reuse the session's last result at this tier"""
+        with self.lock:
+            session = self._session(session_id)
+            session.frames += 1
+            skip = session.last_result is not None and session.frames % TIER_STRIDE[tier] != 0
+            if skip:
+                self.stats['skipped'] += 1
+            return skip
+
+    def last_result(self, session_id):
+        with self.lock:
+            return self._session(session_id).last_result
+
+    def expired(self, arrived):
+        """True (and counted) if work that arrived at `arrived` is past its deadline"""
+        if time.perf_counter() - arrived <= self.deadline:
+            return False
+        with self.lock:
+            self.stats['dropped_deadline'] += 1
+        return True
+
+    def finished(self, session_id, tier, result, service_seconds):
+        """Called for every admitted request; `result` is None if it was dropped"""
+        with self.lock:
+            # Exponentially weighted so the estimate follows load changes within a few requests
+            self.service_time = 0.8 * self.service_time + 0.2 * service_seconds
+            if result is not None:
+                self.stats['served_by_tier'][TIERS[tier]] += 1
+                self._session(session_id).last_result = result
+
+    def suggested_interval_ms(self, tier):
+        """How often a client should send frames to stay within its budget at this tier"""
+        return int(1000 / self.session_rate * TIER_STRIDE[tier])
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats, served_by_tier=dict(self.stats['served_by_tier']))
+            stats['sessions'] = len(self.sessions)
+            stats['service_time_ms'] = round(self.service_time * 1000, 1)
+        stats['utilisation'] = round(self.utilisation(), 2)
+        stats['tier'] = TIERS[self.tier()]
+        return stats
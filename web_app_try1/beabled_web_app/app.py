@@ -6,11 +6,25 @@ from flask_socketio import SocketIO, emit, join_room, leave_room
 import numpy as np
 import cv2
 import base64
-import json
-import tensorflow as tf
 import mediapipe as mp
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
 import secrets
 import logging
+import os
+import sys
+import time
+
+# Helpers shared with the desktop front ends live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from quality_gate import QualityGate, handedness_score, landmark_array
+from hard_examples import HardExampleSink
+from presence_gate import SessionGates
+from admission import AdmissionController, TIERS, REDUCED, CHEAP
+from model_registry import ModelRegistry, load_version
+from cascade import Cascade
+from rooms import RoomRegistry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,17 +34,62 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(16)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 
-# Load ASL model
+# Load ASL model from the versioned registry (falls back to the legacy files)
+registry = ModelRegistry(
+    os.environ.get('ASL_MODEL_REGISTRY', 'model_registry'),
+    'gesture_mobilenet_advanced2.h5', 'class_indices.json',
+    poll_seconds=float(os.environ.get('ASL_REGISTRY_POLL', 10)),
+    run_blocking=tpool.execute
+)
 try:
-    model = tf.keras.models.load_model('gesture_mobilenet_advanced2.h5')
-    with open('class_indices.json') as f:
-        class_indices = json.load(f)
-    idx_to_class = {v: k for k, v in class_indices.items()}
-    logger.info("ASL model loaded successfully")
+    registry.refresh()
+    logger.info(f"ASL model {registry.active.version} loaded successfully")
 except Exception as e:
     logger.error(f"Error loading ASL model: {e}")
     raise
 
+# Optional cheaper model served at the 'cheap' degradation tier, e.g. the
+# model picked by sweep_backbones.py together with its own label map
+FAST_MODEL_PATH = os.environ.get('ASL_FAST_MODEL', 'gesture_fast.h5')
+FAST_LABELS_PATH = os.environ.get('ASL_FAST_LABELS', 'class_indices_fast.json')
+fast_model = None
+if os.path.exists(FAST_MODEL_PATH):
+    fast_model = load_version('fast', FAST_MODEL_PATH,
+                              FAST_LABELS_PATH if os.path.exists(FAST_LABELS_PATH) else 'class_indices.json')
+    fast_model.run_blocking = tpool.execute
+    logger.info(f"Fast fallback model loaded from {FAST_MODEL_PATH}")
+
+# Cascade mode: the fast model answers confident frames and clear no-signs,
+# only its uncertainty band is escalated to the registry's active model
+cascade = None
+if fast_model is not None and os.environ.get('ASL_CASCADE') == '1':
+    cascade = Cascade(fast_model,
+                      low=float(os.environ.get('ASL_CASCADE_LOW', 0.5)),
+                      high=float(os.environ.get('ASL_CASCADE_HIGH', 0.9)),
+                      min_margin=float(os.environ.get('ASL_CASCADE_MARGIN', 0.2)))
+    logger.info(f"Cascade enabled, escalating band {cascade.low}-{cascade.high}")
+
+admission = AdmissionController(
+    global_rate=float(os.environ.get('ASL_GLOBAL_RATE', 50)),
+    session_rate=float(os.environ.get('ASL_SESSION_RATE', 5)),
+    deadline_ms=float(os.environ.get('ASL_DEADLINE_MS', 500))
+)
+REDUCED_MAX_SIDE = 320  # frames are downscaled to this before hand detection when degraded
+MAX_CROP_SIDE = 512  # client crops are square, run_version resizes them to the model input
+quality_gate = QualityGate()
+# Per-client motion gate in front of MediaPipe on the full-frame path. Sized in
+# seconds since clients poll at anything from 1 frame a second (slower when
+# the server asks them to back off) upwards
+presence_gates = SessionGates(idle_seconds=float(os.environ.get('ASL_PRESENCE_IDLE_SECONDS', 3)))
+# Optional sink for low-confidence crops to relabel and retrain on
+hard_examples = None
+if os.environ.get('ASL_HARD_EXAMPLES_DIR'):
+    hard_examples = HardExampleSink(
+        os.environ['ASL_HARD_EXAMPLES_DIR'],
+        sample_rate=float(os.environ.get('ASL_HARD_EXAMPLE_RATE', 0.1)),
+        run_blocking=tpool.execute
+    )
+
 # Initialize MediaPipe Hands
 mp_hands = mp.solutions.hands
 hands = mp_hands.Hands(
@@ -39,78 +98,361 @@ hands = mp_hands.Hands(
     min_detection_confidence=0.5,  # slightly lower to allow more detections
     min_tracking_confidence=0.5
 )
+# One MediaPipe graph, run on a tpool thread; requests queue here without blocking the hub
+hands_lock = Semaphore()
 
 # Room management
-active_rooms = {}
+rooms = RoomRegistry(
+    max_rooms=int(os.environ.get('ASL_MAX_ROOMS', 1000)),
+    max_participants=int(os.environ.get('ASL_MAX_PARTICIPANTS', 16)),
+    idle_ttl=float(os.environ.get('ASL_ROOM_IDLE_TTL', 3600)),
+    # Hard cap for idle rooms that still have a connected participant
+    live_idle_ttl=float(os.environ.get('ASL_ROOM_LIVE_IDLE_TTL', 4 * 3600))
+)
+ROOM_REAP_SECONDS = 60
+# Socket.IO sids the server has handed out; HTTP clients may only claim one of these
+connected_sids = set()
+
+
+def close_idle_rooms():
+    """Close rooms nobody has been active in for the idle TTL (longer if someone is still connected)"""
+    for room_id, sids in rooms.evict_idle(is_live=connected_sids.__contains__).items():
+        socketio.emit('room_closed', {'room_id': room_id, 'reason': 'idle'}, room=room_id)
+        socketio.close_room(room_id)
+        logger.info(f"Evicted idle room {room_id} ({len(sids)} participants)")
+
+
+def reap_idle_rooms():
+    """Background task"""
+    while True:
+        socketio.sleep(ROOM_REAP_SECONDS)
+        close_idle_rooms()
 
 @app.route("/")
 def home():
     return render_template("index.html")
 
+def run_version(version, cropped_hand, capture=None, arrived=None):
+    """Classify a BGR hand crop with one model version, returns (label, confidence, seconds).
+
+    With `capture` (keyword arguments for HardExampleSink.offer) a
+    low-confidence result is offered to the hard example sink. With `arrived`
+    the deadline is checked once the model is free; returns None if it passed.
+    """
+    t0 = time.perf_counter()
+    img = cropped_hand
+    if img.shape[:2] != version.input_size:
+        img = cv2.resize(img, version.input_size[::-1])
+    img = img / 255.0
+    preds = version.predict(np.expand_dims(img, axis=0),
+                            cancelled=None if arrived is None else lambda: admission.expired(arrived))
+    if preds is None:
+        return None
+    class_idx = np.argmax(preds)
+    confidence = float(preds[0][class_idx])
+
+    label = "-"
+    if confidence > 0.7 and class_idx in version.idx_to_class:
+        label = version.idx_to_class[class_idx]
+    elif capture is not None and hard_examples is not None:
+        hard_examples.offer(cropped_hand, preds[0], version.idx_to_class,
+                            model_version=version.version, **capture)
+    return label, confidence, time.perf_counter() - t0
+
+
+def shadow_compare(candidate, cropped_hand, active_label, active_seconds):
+    label, _, seconds = run_version(candidate, cropped_hand)
+    registry.record_shadow(label == active_label, active_seconds, seconds)
+
+
+def classify_crop(cropped_hand, use_fast=False, capture=None, arrived=None):
+    """Run the gesture model on a BGR hand crop.
+
+    Returns (label, confidence), or None if the deadline passed before a
+    model was free to run it.
+    """
+    if use_fast and fast_model is not None:
+        result = run_version(fast_model, cropped_hand, arrived=arrived)
+        return None if result is None else result[:2]
+    if cascade is not None:
+        result = cascade.classify(cropped_hand, lambda crop: classify_full(crop, capture, arrived))
+        return None if result is None else (result[0] or "-", result[1])
+    return classify_full(cropped_hand, capture, arrived)
+
+
+def classify_full(cropped_hand, capture=None, arrived=None):
+    """Active registry model, plus the sampled shadow run; returns (label, confidence) or None"""
+    active = registry.active  # read once, a hot-swap mid-request can't mix versions
+    result = run_version(active, cropped_hand, capture, arrived)
+    if result is None:
+        return None
+    label, confidence, seconds = result
+    candidate = registry.candidate
+    # The candidate's predict runs on a tpool thread (registry run_blocking), so
+    # the shadow run never blocks the hub; skip the sample if one is still running
+    if candidate is not None and registry.should_shadow() and not candidate.lock.locked():
+        socketio.start_background_task(shadow_compare, candidate, cropped_hand, label, seconds)
+    return label, confidence
+
+
+def recognise(session_id, arrived, work):
+    """Wrap one recognition request in admission control and tier selection.
+
+    `work(tier)` runs the pipeline and returns (label, confidence), or None
+    if it gave up because the deadline passed. Returns (response, http_status).
+    """
+    refused = admission.admit(session_id)
+    tier = admission.tier()
+    # input_size lets browser clients follow a hot-swap to a model with another input size
+    body = {'tier': TIERS[tier], 'suggested_interval_ms': admission.suggested_interval_ms(tier),
+            'input_size': list(registry.active.input_size)}
+    if refused:
+        body.update(status='rate_limited', message=refused)
+        return body, 429
+
+    if admission.should_skip(session_id, tier):
+        label, confidence = admission.last_result(session_id)
+        body.update(prediction=label, confidence=f"{confidence:.2f}", status='success', skipped=True)
+        return body, 200
+
+    result = work(tier)
+    # Dropped requests count towards the service time too, they are what overload looks like
+    admission.finished(session_id, tier, result, time.perf_counter() - arrived)
+    if result is None:
+        body.update(status='dropped', message='deadline exceeded')
+        return body, 503
+
+    label, confidence = result
+    body.update(prediction=label, confidence=f"{confidence:.2f}", status='success')
+    return body, 200
+
+
+def decode_image(data):
+    """Decode a data URL, base64 string or raw JPEG/PNG bytes into a BGR image"""
+    if isinstance(data, str):
+        data = base64.b64decode(data.split(',')[-1])
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def parse_crop_request(data):
+    """Validate a client-side crop payload, returns (crop, landmarks, box_size)"""
+    if not data or 'image' not in data:
+        raise ValueError("Missing 'image'")
+    crop = decode_image(data['image'])
+    if crop is None:
+        raise ValueError("Could not decode image")
+    h, w = crop.shape[:2]
+    if h != w or not 0 < w <= MAX_CROP_SIDE:
+        raise ValueError(f"Crop must be square and at most {MAX_CROP_SIDE}px, got {w}x{h}")
+
+    landmarks = data.get('landmarks')
+    if landmarks is not None:
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        if landmarks.shape not in ((21, 2), (21, 3)):
+            raise ValueError("Landmarks must be 21 [x, y(, z)] points")
+
+    # Hand box side in video pixels before the browser resized the crop
+    box_size = data.get('box_size')
+    if box_size is not None:
+        if not isinstance(box_size, (int, float)) or box_size <= 0:
+            raise ValueError("box_size must be a positive number")
+        box_size = float(box_size)
+    return crop, landmarks, box_size
+
+
+def detect_and_classify(frame, tier, arrived, session_id):
+    """Full-frame pipeline: presence gate, MediaPipe hand detection, crop, classify"""
+    scale = 1.0
+    if tier >= REDUCED:
+        h, w, _ = frame.shape
+        scale = min(1.0, REDUCED_MAX_SIDE / max(h, w))
+        if scale < 1:
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    if admission.expired(arrived):
+        return None
+
+    presence = presence_gates.get(session_id)
+    if not presence.active(frame):
+        return "-", 0.0
+
+    # ASL Detection
+    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    with hands_lock:
+        if admission.expired(arrived):  # waited behind other frames for too long
+            return None
+        t0 = time.perf_counter()
+        results = tpool.execute(hands.process, image_rgb)
+        presence.record_detection(time.perf_counter() - t0)
+    if results.multi_hand_landmarks:
+        presence.keep_awake()
+
+    label = "-"
+    confidence = 0.0
+
+    if results.multi_hand_landmarks:
+        for i, hand_landmarks in enumerate(results.multi_hand_landmarks):
+            h, w, _ = frame.shape
+            x_min = int(min([lm.x for lm in hand_landmarks.landmark]) * w)
+            y_min = int(min([lm.y for lm in hand_landmarks.landmark]) * h)
+            x_max = int(max([lm.x for lm in hand_landmarks.landmark]) * w)
+            y_max = int(max([lm.y for lm in hand_landmarks.landmark]) * h)
+
+            # Add 20% padding
+            x_min = max(0, x_min - int(0.2 * (x_max - x_min)))
+            y_min = max(0, y_min - int(0.2 * (y_max - y_min)))
+            x_max = min(w, x_max + int(0.2 * (x_max - x_min)))
+            y_max = min(h, y_max + int(0.2 * (y_max - y_min)))
+
+            cropped_hand = frame[y_min:y_max, x_min:x_max]
+            if cropped_hand.size == 0:
+                logger.warning("Detected hand had invalid crop region.")
+                continue
+
+            # Box size is judged in original frame pixels, whatever the tier
+            box_size = min(cropped_hand.shape[:2]) / scale
+            if quality_gate.check(cropped_hand, hand_landmarks, handedness_score(results, i), box_size):
+                continue
+
+            if admission.expired(arrived):
+                return None
+            capture = None
+            if hard_examples is not None:
+                # Landmarks relative to the crop, so the sink can write a VOC bbox
+                points = landmark_array(hand_landmarks) * (w, h) - (x_min, y_min)
+                capture = {'landmarks': points / (x_max - x_min, y_max - y_min)}
+            result = classify_crop(cropped_hand, use_fast=tier == CHEAP, capture=capture, arrived=arrived)
+            if result is None:
+                return None
+            label, confidence = result
+
+    else:
+        logger.warning("No hand landmarks detected.")
+
+    return label, confidence
+
+
+def classify_client_crop(crop, landmarks, box_size, tier, arrived):
+    if admission.expired(arrived):
+        return None
+    # The crop arrives resized to model size, so its own size says nothing about the hand's
+    if quality_gate.check(crop, landmarks, box_size=box_size):
+        return "-", 0.0
+    return classify_crop(crop, use_fast=tier == CHEAP, capture={'frame_landmarks': landmarks},
+                         arrived=arrived)
+
+
+def http_session_id():
+    """Admission session for an HTTP request.
+
+    Browsers send their Socket.IO sid, which the server issued and which dies
+    with the connection, so made-up ids can't buy fresh rate-limit buckets.
+    Anything else shares the bucket of its address.
+    """
+    sid = request.headers.get('X-Session-Id')
+    if sid in connected_sids:
+        return sid
+    return request.remote_addr
+
+
+def presence_session_id(session_id):
+    """Presence gate key for an HTTP request.
+
+    Each page sends a random X-Client-Id, so tabs behind the same address
+    (or the same tab before its socket connects) don't share one motion
+    history. It is scoped to the admission session, so it can't reach into
+    another client's gate.
+    """
+    client_id = request.headers.get('X-Client-Id', '')[:64]
+    return f"{session_id}/{client_id}"
+
+
 @app.route("/predict", methods=["POST"])
 def predict():
+    arrived = time.perf_counter()
     try:
-        data = request.json['image']
-        image_data = base64.b64decode(data.split(',')[1])
-        frame = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
-
-        # ASL Detection
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(image_rgb)
-
-        label = "-"
-        confidence = 0.0
-
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                h, w, _ = frame.shape
-                x_min = int(min([lm.x for lm in hand_landmarks.landmark]) * w)
-                y_min = int(min([lm.y for lm in hand_landmarks.landmark]) * h)
-                x_max = int(max([lm.x for lm in hand_landmarks.landmark]) * w)
-                y_max = int(max([lm.y for lm in hand_landmarks.landmark]) * h)
-
-                # Add 20% padding
-                x_min = max(0, x_min - int(0.2 * (x_max - x_min)))
-                y_min = max(0, y_min - int(0.2 * (y_max - y_min)))
-                x_max = min(w, x_max + int(0.2 * (x_max - x_min)))
-                y_max = min(h, y_max + int(0.2 * (y_max - y_min)))
-
-                cropped_hand = frame[y_min:y_max, x_min:x_max]
-                if cropped_hand.size == 0:
-                    logger.warning("Detected hand had invalid crop region.")
-                    continue
-
-                img = cv2.resize(cropped_hand, (160, 160))
-                img = img / 255.0
-                preds = model.predict(np.expand_dims(img, axis=0), verbose=0)
-                class_idx = np.argmax(preds)
-                confidence = float(preds[0][class_idx])
-
-                if confidence > 0.7 and class_idx in idx_to_class:
-                    label = idx_to_class[class_idx]
-
-        else:
-            logger.warning("No hand landmarks detected.")
-
-        return jsonify({
-            'prediction': label,
-            'confidence': f"{confidence:.2f}",
-            'status': 'success'
-        })
+        frame = decode_image(request.json['image'])
+        session_id = http_session_id()
+        presence_id = presence_session_id(session_id)
+        body, status = recognise(session_id, arrived,
+                                 lambda tier: detect_and_classify(frame, tier, arrived, presence_id))
+        return jsonify(body), status
 
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route("/predict_crop", methods=["POST"])
+def predict_crop():
+    """Classify a square hand crop the browser already detected (resized to the model input here)"""
+    arrived = time.perf_counter()
+    try:
+        crop, landmarks, box_size = parse_crop_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        body, status = recognise(http_session_id(), arrived,
+                                 lambda tier: classify_client_crop(crop, landmarks, box_size, tier, arrived))
+        return jsonify(body), status
+    except Exception as e:
+        logger.error(f"Crop prediction error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route("/stats")
+def stats():
+    return jsonify({'admission': admission.snapshot(), 'models': registry.snapshot(),
+                    'quality_gate': quality_gate.stats(),
+                    'cascade': cascade.stats() if cascade else None,
+                    'rooms': rooms.snapshot(),
+                    'presence_gate': presence_gates.stats(),
+                    'hard_examples': hard_examples.stats() if hard_examples else None})
+
+# Operator endpoints need this token as 'Authorization: Bearer ...'; without
+# one configured they only answer requests from the machine itself
+ADMIN_TOKEN = os.environ.get('ASL_ADMIN_TOKEN')
+
+
+def is_operator():
+    if ADMIN_TOKEN:
+        auth = request.headers.get('Authorization', '')
+        return secrets.compare_digest(auth.encode(), f"Bearer {ADMIN_TOKEN}".encode())
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+@app.route("/models/promote", methods=["POST"])
+def promote_model():
+    """Promote the shadow candidate to serve all traffic"""
+    if not is_operator():
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+    try:
+        registry.promote()
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+    return jsonify({'status': 'success', 'models': registry.snapshot()})
+
 # Socket.IO Events
 @socketio.on('connect')
 def handle_connect():
+    connected_sids.add(request.sid)
     logger.info(f"Client connected: {request.sid}")
 
+@socketio.on('disconnect')
+def handle_disconnect():
+    connected_sids.discard(request.sid)
+    # Flask-SocketIO drops the sid from its own rooms; keep the registry in step
+    for room_id in rooms.disconnect(request.sid):
+        emit('participant_left', {'sid': request.sid}, room=room_id)
+    logger.info(f"Client disconnected: {request.sid}")
+
 @socketio.on('create_room')
 def handle_create_room():
     room_id = secrets.token_urlsafe(6)
-    active_rooms[room_id] = {'participants': [request.sid]}
+    close_idle_rooms()  # frees capacity before the cap is checked
+    error = rooms.create(room_id, request.sid)
+    if error:
+        emit('error', {'message': error})
+        logger.warning(f"Room creation refused for {request.sid}: {error}")
+        return
     join_room(room_id)
     emit('room_created', {'room_id': room_id})
     logger.info(f"Room created: {room_id}")
@@ -118,30 +460,44 @@ def handle_create_room():
 @socketio.on('join_room')
 def handle_join_room(data):
     room_id = data.get('room_id')
-    if room_id in active_rooms:
+    error = rooms.join(room_id, request.sid)
+    if error is None:
         join_room(room_id)
-        active_rooms[room_id]['participants'].append(request.sid)
         emit('participant_joined', {'sid': request.sid}, room=room_id)
         logger.info(f"Client {request.sid} joined room {room_id}")
     else:
-        emit('error', {'message': 'Room not found'})
-        logger.warning(f"Attempt to join non-existent room: {room_id}")
+        emit('error', {'message': error})
+        logger.warning(f"Client {request.sid} could not join room {room_id}: {error}")
 
 @socketio.on('leave_room')
 def handle_leave_room(data):
     room_id = data.get('room_id')
-    if room_id in active_rooms:
+    if rooms.leave(room_id, request.sid):
         leave_room(room_id)
-        active_rooms[room_id]['participants'].remove(request.sid)
-        if not active_rooms[room_id]['participants']:
-            del active_rooms[room_id]
+        emit('participant_left', {'sid': request.sid}, room=room_id)
         logger.info(f"Client {request.sid} left room {room_id}")
 
 
+@socketio.on('signal')
+def handle_signal(data):
+    """Relays WebRTC offers and answers to the other participants in the room"""
+    if not rooms.is_member(data.get('room'), request.sid):
+        emit('error', {'message': "Not a participant of this room"})
+        logger.warning(f"Dropped signal from {request.sid}, not in room {data.get('room')}")
+        return
+    rooms.touch(data['room'])
+    emit('signal', {
+        'from': request.sid,
+        'type': data['type'],
+        'sdp': data['sdp']
+    }, room=data['room'], include_self=False)
+
+
 # Add these Socket.IO handlers
 @socketio.on('raise_hand')
 def handle_raise_hand(data):
     room = data['room']
+    rooms.touch(room)
     emit('hand_raised', {
         'userId': request.sid,
         'state': data['state']
@@ -150,10 +506,27 @@ def handle_raise_hand(data):
 @socketio.on('chat_message')
 def handle_chat_message(data):
     room = data['room']
+    rooms.touch(room)
     emit('chat_message', {
         'message': data['message'],
         'sender': data.get('sender', 'Anonymous')
     }, room=room)
 
+@socketio.on('predict_crop')
+def handle_predict_crop(data):
+    """Socket.IO twin of /predict_crop, accepts the crop as binary JPEG"""
+    arrived = time.perf_counter()
+    rooms.touch_sid(request.sid)  # signing in a call keeps its room alive
+    try:
+        crop, landmarks, box_size = parse_crop_request(data)
+        body, _ = recognise(request.sid, arrived,
+                            lambda tier: classify_client_crop(crop, landmarks, box_size, tier, arrived))
+        emit('prediction', body)
+    except Exception as e:
+        logger.error(f"Crop prediction error: {e}")
+        emit('prediction', {'status': 'error', 'message': str(e)})
+
 if __name__ == "__main__":
+    socketio.start_background_task(registry.watch, socketio.sleep)
+    socketio.start_background_task(reap_idle_rooms)
     socketio.run(app, debug=True, host='0.0.0.0', port=8080)
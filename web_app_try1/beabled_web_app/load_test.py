@@ -0,0 +1,326 @@
+"""Local load generator for app.py.
+
+Usage:
+    python app.py &
+    python load_test.py --participants 40 --rooms 10 --fps 2 --duration 60 \
+        --server-pid $!
+
+Simulates N participants spread over M rooms against a locally running
+server. Every participant has its own Socket.IO connection, creates or joins
+its room, streams frames from data/ to /predict (or to the 'predict_crop'
+event with --crop) at the configured rate, sends chat messages and raises
+its hand, and leaves at the end. Latencies, error counts, requests the
+server shed (429 rate limits and deadline drops, counted separately so the
+saturation point shows) and throughput are reported per operation; with --server-pid the server's CPU and RSS are
+sampled once a second. Needs python-socketio[client], requests and psutil.
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import cv2
+import numpy as np
+import psutil
+import requests
+import socketio
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        # Load the server shed on purpose (429 / deadline), kept apart from real errors
+        self.shed = {'rate_limited': defaultdict(int), 'dropped': defaultdict(int)}
+        self.fire_and_forget = defaultdict(int)
+
+    def sent(self, op):
+        """Count an operation the server never acknowledges"""
+        with self.lock:
+            self.fire_and_forget[op] += 1
+
+    def record(self, op, seconds):
+        with self.lock:
+            self.latencies[op].append(seconds)
+
+    def error(self, op):
+        with self.lock:
+            self.errors[op] += 1
+
+    def response(self, op, data, sent):
+        """Record a recognition response by its status"""
+        status = data.get('status')
+        if status in self.shed:
+            with self.lock:
+                self.shed[status][op] += 1
+        elif status != 'success':
+            self.error(op)
+        elif sent:
+            self.record(op, time.perf_counter() - sent)
+
+    def summary(self, duration):
+        report = {}
+        ops = set(self.latencies) | set(self.errors) | set(self.fire_and_forget)
+        for shed in self.shed.values():
+            ops |= set(shed)
+        for op in sorted(ops):
+            samples = np.array(self.latencies.get(op, [])) * 1000
+            count = samples.size + self.fire_and_forget.get(op, 0)
+            entry = {
+                'count': int(count),
+                'errors': self.errors.get(op, 0),
+                'rate_limited': self.shed['rate_limited'].get(op, 0),
+                'dropped': self.shed['dropped'].get(op, 0),
+                'throughput_per_s': round(count / duration, 2),
+            }
+            if samples.size:
+                entry.update({
+                    'p50_ms': round(float(np.percentile(samples, 50)), 1),
+                    'p95_ms': round(float(np.percentile(samples, 95)), 1),
+                    'p99_ms': round(float(np.percentile(samples, 99)), 1),
+                    'max_ms': round(float(samples.max()), 1),
+                })
+            report[op] = entry
+        return report
+
+
+def load_frames(data_dir, limit, crop):
+    paths = sorted(glob.glob(os.path.join(data_dir, '*', '*.jpg')))
+    random.shuffle(paths)
+    frames = []
+    for path in paths[:limit]:
+        if crop:
+            img = cv2.resize(cv2.imread(path), (160, 160))
+            frames.append(cv2.imencode('.jpg', img)[1].tobytes())
+        else:
+            with open(path, 'rb') as f:
+                frames.append('data:image/jpeg;base64,' + base64.b64encode(f.read()).decode())
+    if not frames:
+        raise SystemExit(f"No images found under {data_dir}/<class>/")
+    return frames
+
+
+class Participant(threading.Thread):
+    def __init__(self, index, room_slot, owner, args, frames, metrics, rooms, stop):
+        super().__init__(daemon=True)
+        self.index = index
+        self.room_slot = room_slot
+        self.owner = owner
+        self.args = args
+        self.frames = frames
+        self.metrics = metrics
+        self.rooms = rooms  # room_slot -> {'event': Event, 'room_id': str}
+        self.stop = stop
+        self.http = requests.Session()
+        self.sio = socketio.Client(reconnection=False)
+        self.pending = {}  # token -> (op, sent_at)
+        self.room_id = None
+        self.joined = threading.Event()
+
+        self.sio.on('room_created', self._on_room_created)
+        self.sio.on('participant_joined', self._on_participant_joined)
+        self.sio.on('chat_message', self._on_echo)
+        self.sio.on('hand_raised', self._on_hand_raised)
+        self.sio.on('prediction', self._on_prediction)
+        self.sio.on('error', lambda data: self.metrics.error('socket_error'))
+
+    def _on_room_created(self, data):
+        op, sent = self.pending.pop('create_room', (None, None))
+        if sent:
+            self.metrics.record('create_room', time.perf_counter() - sent)
+        self.room_id = data['room_id']
+        self.rooms[self.room_slot]['room_id'] = self.room_id
+        self.rooms[self.room_slot]['event'].set()
+        self.joined.set()
+
+    def _on_participant_joined(self, data):
+        if data.get('sid') == self.sio.sid:
+            op, sent = self.pending.pop('join_room', (None, None))
+            if sent:
+                self.metrics.record('join_room', time.perf_counter() - sent)
+            self.joined.set()
+
+    def _on_echo(self, data):
+        token = data.get('message')
+        if token in self.pending:
+            op, sent = self.pending.pop(token)
+            self.metrics.record(op, time.perf_counter() - sent)
+
+    def _on_hand_raised(self, data):
+        if data.get('userId') == self.sio.sid:
+            op, sent = self.pending.pop('raise_hand', (None, None))
+            if sent:
+                self.metrics.record('raise_hand', time.perf_counter() - sent)
+
+    def _on_prediction(self, data):
+        op, sent = self.pending.pop('predict_crop', (None, None))
+        self.metrics.response('predict_crop', data, sent)
+
+    def _predict(self, frame):
+        if self.args.crop:
+            if 'predict_crop' in self.pending:
+                return  # previous crop still in flight
+            self.pending['predict_crop'] = ('predict_crop', time.perf_counter())
+            self.sio.emit('predict_crop', {'image': frame})
+            return
+        t0 = time.perf_counter()
+        try:
+            # Own rate-limit session per participant, the way the browser does it
+            resp = self.http.post(f"{self.args.url}/predict", json={'image': frame},
+                                  headers={'X-Session-Id': self.sio.sid}, timeout=30)
+            self.metrics.response('predict', resp.json(), t0)
+        except Exception:
+            self.metrics.error('predict')
+
+    def run(self):
+        try:
+            t0 = time.perf_counter()
+            self.sio.connect(self.args.url, transports=['websocket'])
+            self.metrics.record('connect', time.perf_counter() - t0)
+        except Exception:
+            self.metrics.error('connect')
+            return
+
+        slot = self.rooms[self.room_slot]
+        if self.owner:
+            self.pending['create_room'] = ('create_room', time.perf_counter())
+            self.sio.emit('create_room')
+        else:
+            if not slot['event'].wait(30):
+                self.metrics.error('join_room')
+                self.sio.disconnect()
+                return
+            self.room_id = slot['room_id']
+            self.pending['join_room'] = ('join_room', time.perf_counter())
+            self.sio.emit('join_room', {'room_id': self.room_id})
+        if not self.joined.wait(30):
+            self.metrics.error('create_room' if self.owner else 'join_room')
+
+        interval = 1.0 / self.args.fps
+        next_frame = time.perf_counter() + random.random() * interval
+        next_chat = time.perf_counter() + random.expovariate(self.args.chat_rate)
+        next_hand = time.perf_counter() + random.expovariate(self.args.hand_rate)
+        hand_state = False
+        frame_idx = self.index
+        while not self.stop.is_set():
+            now = time.perf_counter()
+            if now >= next_frame:
+                self._predict(self.frames[frame_idx % len(self.frames)])
+                frame_idx += 1
+                next_frame += interval
+                if next_frame < now:
+                    self.metrics.error('frame_late')  # client could not keep up
+                    next_frame = now + interval
+            if now >= next_chat:
+                token = uuid.uuid4().hex
+                self.pending[token] = ('chat_message', now)
+                self.sio.emit('chat_message', {'room': self.room_id, 'message': token,
+                                               'sender': f"load-{self.index}"})
+                next_chat = now + random.expovariate(self.args.chat_rate)
+            if now >= next_hand:
+                hand_state = not hand_state
+                self.pending['raise_hand'] = ('raise_hand', now)
+                self.sio.emit('raise_hand', {'room': self.room_id, 'state': hand_state})
+                next_hand = now + random.expovariate(self.args.hand_rate)
+            time.sleep(max(0.0, min(next_frame, next_chat, next_hand) - time.perf_counter()))
+
+        try:
+            self.sio.emit('leave_room', {'room_id': self.room_id})
+            self.metrics.sent('leave_room')
+            self.sio.disconnect()
+        except Exception:
+            self.metrics.error('leave_room')
+
+
+def sample_server(pid, stop, samples, start):
+    proc = psutil.Process(pid)
+    proc.cpu_percent(None)
+    while not stop.wait(1.0):
+        try:
+            with proc.oneshot():
+                samples.append({
+                    't': round(time.perf_counter() - start, 1),
+                    'cpu_percent': proc.cpu_percent(None),
+                    'rss_mb': round(proc.memory_info().rss / 2**20, 1),
+                    'threads': proc.num_threads(),
+                })
+        except psutil.NoSuchProcess:
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the BeAbled server")
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--participants', type=int, default=10)
+    parser.add_argument('--rooms', type=int, default=5)
+    parser.add_argument('--fps', type=float, default=1.0, help="frames per participant per second")
+    parser.add_argument('--chat-rate', type=float, default=0.2, help="chat messages per second")
+    parser.add_argument('--hand-rate', type=float, default=0.05, help="raise/lower hand per second")
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--ramp-up', type=float, default=5.0, help="seconds to start everyone")
+    parser.add_argument('--crop', action='store_true', help="send 160x160 crops to 'predict_crop'")
+    parser.add_argument('--data', default=os.path.join('..', '..', 'data'))
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--server-pid', type=int)
+    parser.add_argument('--report', default='load_report.json')
+    args = parser.parse_args()
+
+    frames = load_frames(args.data, args.images, args.crop)
+    metrics = Metrics()
+    stop = threading.Event()
+    rooms = {i: {'event': threading.Event(), 'room_id': None} for i in range(args.rooms)}
+
+    start = time.perf_counter()
+    server_samples = []
+    sampler = None
+    if args.server_pid:
+        sampler = threading.Thread(target=sample_server, daemon=True,
+                                   args=(args.server_pid, stop, server_samples, start))
+        sampler.start()
+
+    participants = []
+    for i in range(args.participants):
+        slot = i % args.rooms
+        p = Participant(i, slot, owner=i < args.rooms, args=args, frames=frames,
+                        metrics=metrics, rooms=rooms, stop=stop)
+        participants.append(p)
+        p.start()
+        time.sleep(args.ramp_up / max(args.participants, 1))
+
+    time.sleep(max(0.0, args.duration - (time.perf_counter() - start)))
+    stop.set()
+    for p in participants:
+        p.join(timeout=10)
+    duration = time.perf_counter() - start
+
+    report = {
+        'config': vars(args),
+        'duration_s': round(duration, 1),
+        'operations': metrics.summary(duration),
+        'server': server_samples,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'operation':<14}{'count':>8}{'errors':>8}{'429':>7}{'dropped':>9}"
+          f"{'ops/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for op, e in report['operations'].items():
+        print(f"{op:<14}{e['count']:>8}{e['errors']:>8}{e['rate_limited']:>7}{e['dropped']:>9}"
+              f"{e['throughput_per_s']:>9}"
+              f"{e.get('p50_ms', '-'):>9}{e.get('p95_ms', '-'):>9}{e.get('p99_ms', '-'):>9}")
+    if server_samples:
+        peak_cpu = max(s['cpu_percent'] for s in server_samples)
+        peak_rss = max(s['rss_mb'] for s in server_samples)
+        print(f"\nserver: peak CPU {peak_cpu:.0f}%, peak RSS {peak_rss:.0f} MB")
+    print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Versioned model registry with background loading and atomic hot-swap.
+
+Layout of the registry directory (ASL_MODEL_REGISTRY, default model_registry/):
+
+    model_registry/
+        2024-06-01_v3/
+            model.h5
+            class_indices.json
+            metadata.json      {"shadow": false, "shadow_fraction": 0.1, ...}
+
+Versions are ordered by directory name. The newest version without
+"shadow": true is served; if the newest version overall is marked as shadow
+it is loaded as a candidate and run on a sampled fraction of frames next to
+the active model so latency and agreement can be compared before it is
+promoted (POST /models/promote from localhost or with ASL_ADMIN_TOKEN, or
+drop the shadow flag). New versions are loaded and warmed up off the request
+path and swapped in with a single reference assignment, so a request always
+sees one complete version.
+With run_blocking set (eventlet's tpool in app.py) inference also runs on a
+real OS thread, one batch at a time per version, so queued requests wait
+without holding up the event loop.
+When the registry is empty the legacy model files next to app.py are used.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+logger = logging.getLogger(__name__)
+
+
+class ModelVersion:
+    def __init__(self, version, model, idx_to_class, metadata):
+        self.version = version
+        self.model = model
+        self.idx_to_class = idx_to_class
+        self.metadata = metadata
+        self.input_size = tuple(model.input_shape[1:3])  # (height, width)
+        self.run_blocking = lambda fn, *args, **kwargs: fn(*args, **kwargs)
+        self.lock = threading.Lock()
+
+    def predict(self, batch, cancelled=None):
+        """Softmax rows for a batch.
+
+        `cancelled()` is checked once this version is free, so a request that
+        expired while queued behind others is skipped (returns None) instead
+        of run.
+        """
+        with self.lock:
+            if cancelled is not None and cancelled():
+                return None
+            return self.run_blocking(self.model.predict, batch, verbose=0)
+
+    def warm_up(self, batches=3, batch_size=1):
+        """Run synthetic batches so the first real request doesn't pay for graph tracing"""
+        batch = np.random.rand(batch_size, *self.input_size, 3).astype(np.float32)
+        for _ in range(batches):
+            self.model.predict(batch, verbose=0)
+
+
+def load_version(version, model_path, labels_path, metadata=None):
+    model = tf.keras.models.load_model(model_path)
+    with open(labels_path) as f:
+        class_indices = json.load(f)
+    idx_to_class = {v: k for k, v in class_indices.items()}
+    mv = ModelVersion(version, model, idx_to_class, metadata or {})
+    mv.warm_up()
+    return mv
+
+
+class ModelRegistry:
+    def __init__(self, root, legacy_model, legacy_labels, poll_seconds=10.0,
+                 run_blocking=None):
+        self.root = root
+        self.legacy = (legacy_model, legacy_labels)
+        self.poll_seconds = poll_seconds
+        # Lets the caller push slow loads onto a real OS thread (eventlet's tpool)
+        self.run_blocking = run_blocking or (lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        self.active = None
+        self.candidate = None
+        self.lock = threading.Lock()
+        self.shadow_stats = self._empty_shadow_stats()
+        self.swaps = 0
+
+    @staticmethod
+    def _empty_shadow_stats():
+        return {'frames': 0, 'agreements': 0, 'active_ms': 0.0, 'candidate_ms': 0.0}
+
+    def scan(self):
+        """[(version, path, metadata)] for complete versions, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        versions = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if not all(os.path.exists(os.path.join(path, f))
+                       for f in ('model.h5', 'class_indices.json')):
+                continue  # still being copied in
+            metadata = {}
+            meta_path = os.path.join(path, 'metadata.json')
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    metadata = json.load(f)
+            versions.append((name, path, metadata))
+        return versions
+
+    def _load(self, version, path, metadata):
+        logger.info(f"Loading model version {version}")
+        return self._serve(self.run_blocking(load_version, version, os.path.join(path, 'model.h5'),
+                                             os.path.join(path, 'class_indices.json'), metadata))
+
+    def _serve(self, model_version):
+        """Route a loaded version's inference through run_blocking too"""
+        model_version.run_blocking = self.run_blocking
+        return model_version
+
+    def refresh(self):
+        versions = self.scan()
+        serving = [v for v in versions if not v[2].get('shadow')]
+        if serving:
+            version, path, metadata = serving[-1]
+            if self.active is None or self.active.version != version:
+                self._swap(self._load(version, path, metadata))
+        elif self.active is None:
+            self._swap(self._serve(self.run_blocking(load_version, 'legacy', *self.legacy)))
+
+        shadow = versions[-1] if versions and versions[-1][2].get('shadow') else None
+        if shadow is None:
+            self.candidate = None
+        elif self.candidate is None or self.candidate.version != shadow[0]:
+            self.candidate = self._load(*shadow)
+            with self.lock:
+                self.shadow_stats = self._empty_shadow_stats()
+            logger.info(f"Shadowing candidate model {shadow[0]}")
+
+    def _swap(self, new_version):
+        old = self.active
+        self.active = new_version  # single assignment: in-flight requests keep the old one
+        self.swaps += 1
+        logger.info(f"Now serving model version {new_version.version}"
+                    + (f" (was {old.version})" if old else ""))
+
+    def promote(self):
+        """Serve the shadow candidate; persisted by clearing its shadow flag"""
+        candidate = self.candidate
+        if candidate is None:
+            raise ValueError("No candidate model to promote")
+        meta_path = os.path.join(self.root, candidate.version, 'metadata.json')
+        metadata = dict(candidate.metadata, shadow=False, promoted_at=time.time())
+        with open(meta_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        candidate.metadata = metadata
+        self.candidate = None
+        self._swap(candidate)
+
+    def should_shadow(self):
+        candidate = self.candidate
+        if candidate is None:
+            return False
+        return random.random() < candidate.metadata.get('shadow_fraction', 0.1)
+
+    def record_shadow(self, agreed, active_seconds, candidate_seconds):
+        with self.lock:
+            self.shadow_stats['frames'] += 1
+            self.shadow_stats['agreements'] += int(agreed)
+            self.shadow_stats['active_ms'] += active_seconds * 1000
+            self.shadow_stats['candidate_ms'] += candidate_seconds * 1000
+
+    def watch(self, sleep):
+        """Poll loop, meant to run as a background task"""
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Model registry refresh failed: {e}")
+            sleep(self.poll_seconds)
+
+    def snapshot(self):
+        with self.lock:
+            shadow = dict(self.shadow_stats)
+        frames = shadow['frames']
+        return {
+            'active': self.active.version if self.active else None,
+            'candidate': self.candidate.version if self.candidate else None,
+            'swaps': self.swaps,
+            'shadow': {
+                'frames': frames,
+                'agreement': round(shadow['agreements'] / frames, 3) if frames else None,
+                'active_ms': round(shadow['active_ms'] / frames, 2) if frames else None,
+                'candidate_ms': round(shadow['candidate_ms'] / frames, 2) if frames else None,
+            },
+        }
@@ -0,0 +1,186 @@
+"""In-memory room registry for the Socket.IO call rooms.
+
+Two set indexes, room -> sids and sid -> rooms, make join, leave and
+disconnect cleanup O(1) per membership. Rooms are kept in an OrderedDict
+ordered by last activity, so idle rooms are evicted from the front without
+a scan. Rooms disappear as soon as their last participant leaves or
+disconnects; rooms that are still occupied but silent for longer than the
+idle TTL are evicted by the reaper task. Media and HTTP recognition never go
+through the room, so a quiet call is not necessarily a dead one: rooms with a
+participant that is still connected get the longer live idle TTL instead.
+Room count, participants per room and rooms per client are capped.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class Room:
+    __slots__ = ('sids', 'created', 'last_active')
+
+    def __init__(self, now):
+        self.sids = set()
+        self.created = now
+        self.last_active = now
+
+
+class RoomRegistry:
+    def __init__(self, max_rooms=1000, max_participants=16, max_rooms_per_sid=4, idle_ttl=3600.0,
+                 live_idle_ttl=None):
+        self.max_rooms = max_rooms
+        self.max_participants = max_participants
+        self.max_rooms_per_sid = max_rooms_per_sid
+        self.idle_ttl = idle_ttl
+        self.live_idle_ttl = max(idle_ttl, live_idle_ttl or idle_ttl)
+        self.rooms = OrderedDict()  # least recently active first
+        self.sid_rooms = {}
+        self.lock = threading.Lock()
+        self.stats = {'created': 0, 'joined': 0, 'left': 0, 'disconnected': 0,
+                      'emptied': 0, 'evicted_idle': 0, 'rejected': 0}
+
+    def __contains__(self, room_id):
+        return room_id in self.rooms
+
+    def participants(self, room_id):
+        with self.lock:
+            room = self.rooms.get(room_id)
+            return set(room.sids) if room else set()
+
+    def is_member(self, room_id, sid):
+        with self.lock:
+            room = self.rooms.get(room_id)
+            return room is not None and sid in room.sids
+
+    def create(self, room_id, sid, now=None):
+        """Create a room with `sid` in it; returns an error message or None"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if len(self.rooms) >= self.max_rooms:
+                self.stats['rejected'] += 1
+                return "Server is at room capacity"
+            error = self._check_sid(sid)
+            if error:
+                return error
+            self.rooms[room_id] = Room(now)
+            self.stats['created'] += 1
+            self._add(room_id, sid, now)
+        return None
+
+    def join(self, room_id, sid, now=None):
+        """Add `sid` to an existing room; returns an error message or None"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            room = self.rooms.get(room_id)
+            if room is None:
+                return "Room not found"
+            if sid in room.sids:
+                return None
+            if len(room.sids) >= self.max_participants:
+                self.stats['rejected'] += 1
+                return "Room is full"
+            error = self._check_sid(sid)
+            if error:
+                return error
+            self._add(room_id, sid, now)
+            self.stats['joined'] += 1
+        return None
+
+    def leave(self, room_id, sid):
+        """Returns True if `sid` was in the room"""
+        with self.lock:
+            removed = self._remove(room_id, sid)
+            if removed:
+                self.stats['left'] += 1
+        return removed
+
+    def disconnect(self, sid):
+        """Drop `sid` from every room it was in; returns those room ids"""
+        with self.lock:
+            room_ids = list(self.sid_rooms.get(sid, ()))
+            for room_id in room_ids:
+                self._remove(room_id, sid)
+            if room_ids:
+                self.stats['disconnected'] += 1
+        return room_ids
+
+    def touch(self, room_id, now=None):
+        """Record activity in a room so the reaper leaves it alone"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            room = self.rooms.get(room_id)
+            if room is not None:
+                room.last_active = now
+                self.rooms.move_to_end(room_id)
+
+    def touch_sid(self, sid, now=None):
+        """Activity from a client counts for every room it is in"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for room_id in self.sid_rooms.get(sid, ()):
+                self.rooms[room_id].last_active = now
+                self.rooms.move_to_end(room_id)
+
+    def evict_idle(self, now=None, is_live=None):
+        """Remove rooms idle for longer than the TTL; returns {room_id: sids}.
+
+        Only looks at the front of the activity order, so it is cheap enough
+        to call before every create. With `is_live(sid)` an idle room that
+        still has a connected participant is kept until the live idle TTL;
+        those rooms stay at the front and are skipped, not refreshed.
+        """
+        now = time.monotonic() if now is None else now
+        evicted = {}
+        with self.lock:
+            for room_id, room in self.rooms.items():
+                idle = now - room.last_active
+                if idle < self.idle_ttl:
+                    break  # everything after this was active more recently
+                if (idle < self.live_idle_ttl and is_live is not None
+                        and any(is_live(sid) for sid in room.sids)):
+                    continue
+                evicted[room_id] = room.sids
+            for room_id, sids in evicted.items():
+                for sid in sids:
+                    self._unindex(room_id, sid)
+                del self.rooms[room_id]
+                self.stats['evicted_idle'] += 1
+        return evicted
+
+    def _check_sid(self, sid):
+        if len(self.sid_rooms.get(sid, ())) >= self.max_rooms_per_sid:
+            self.stats['rejected'] += 1
+            return "Too many rooms for this client"
+        return None
+
+    def _add(self, room_id, sid, now):
+        room = self.rooms[room_id]
+        room.sids.add(sid)
+        room.last_active = now
+        self.rooms.move_to_end(room_id)
+        self.sid_rooms.setdefault(sid, set()).add(room_id)
+
+    def _remove(self, room_id, sid):
+        room = self.rooms.get(room_id)
+        if room is None or sid not in room.sids:
+            return False
+        room.sids.discard(sid)
+        self._unindex(room_id, sid)
+        if not room.sids:
+            del self.rooms[room_id]
+            self.stats['emptied'] += 1
+        return True
+
+    def _unindex(self, room_id, sid):
+        rooms = self.sid_rooms.get(sid)
+        if rooms is not None:
+            rooms.discard(room_id)
+            if not rooms:
+                del self.sid_rooms[sid]
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['rooms'] = len(self.rooms)
+            stats['clients'] = len(self.sid_rooms)
+            stats['participants'] = sum(len(room.sids) for room in self.rooms.values())
+        return stats
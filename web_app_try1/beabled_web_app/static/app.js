@@ -7,6 +7,9 @@ let stream = null;
 let predictionInterval = null;
 let currentRoom = null;
 let socket = null;
+// Identifies this page to the server's per-client motion gate
+const CLIENT_ID = window.crypto && crypto.randomUUID ?
+    crypto.randomUUID() : Math.random().toString(36).slice(2) + Date.now().toString(36);
 
 // DOM Elements
 const localVideo = document.getElementById("localVideo");
@@ -51,11 +54,14 @@ function initSocket() {
     socket.on('error', (data) => {
         showToast(data.message, 'danger');
     });
+
+    socket.on('prediction', showPrediction);
 }
 
 // Initialize App
 document.addEventListener('DOMContentLoaded', () => {
     initSocket();
+    initClientHands();
     setupEventListeners();
     checkForRoomInURL();
 });
@@ -185,37 +191,152 @@ function startASLPrediction() {
     captionDisplay.style.display = "block";
     captionDisplay.textContent = "Detecting gestures...";
     
-    predictionInterval = setInterval(async () => {
-        if (!callActive || !aslEnabled || !cameraEnabled) return;
-        
+    predictionInterval = setInterval(predictionTick, predictionDelay);
+}
+
+async function predictionTick() {
+    if (!callActive || !aslEnabled || !cameraEnabled) return;
+    
+    // Detect and crop in the browser, only a model-sized crop goes to the server
+    if (clientHands) {
+        if (handsBusy) return;
+        handsBusy = true;
         try {
-            const canvas = document.createElement('canvas');
-            canvas.width = localVideo.videoWidth;
-            canvas.height = localVideo.videoHeight;
-            const ctx = canvas.getContext('2d');
-            ctx.drawImage(localVideo, 0, 0, canvas.width, canvas.height);
-            
-            const response = await fetch('/predict', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ image: canvas.toDataURL('image/jpeg') })
-            });
-            
-            const data = await response.json();
-            if (data.status === 'success') {
-                const displayText = data.prediction === '-' ? 
-                    'No gesture detected' : 
-                    `✋ ${data.prediction} (${data.confidence})`;
-                captionDisplay.textContent = displayText;
-                speakText(data.prediction); // 🔊 Voice here
-            } else {
-                captionDisplay.textContent = "Detection error";
-            }
+            await clientHands.send({ image: localVideo });
         } catch (error) {
-            console.error("ASL processing error:", error);
-            captionDisplay.textContent = "Processing error";
+            console.error("Client hand detection error:", error);
+        } finally {
+            handsBusy = false;
         }
-    }, 1000);
+        return;
+    }
+    
+    try {
+        const canvas = document.createElement('canvas');
+        canvas.width = localVideo.videoWidth;
+        canvas.height = localVideo.videoHeight;
+        const ctx = canvas.getContext('2d');
+        ctx.drawImage(localVideo, 0, 0, canvas.width, canvas.height);
+        
+        const response = await fetch('/predict', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-Session-Id': socket.id,
+                'X-Client-Id': CLIENT_ID
+            },
+            body: JSON.stringify({ image: canvas.toDataURL('image/jpeg') })
+        });
+        
+        showPrediction(await response.json());
+    } catch (error) {
+        console.error("ASL processing error:", error);
+        captionDisplay.textContent = "Processing error";
+    }
+}
+
+// The server reports which degradation tier served each request and how
+// often it wants frames; never poll faster than the base rate
+const BASE_PREDICTION_DELAY = 1000;
+let predictionDelay = BASE_PREDICTION_DELAY;
+
+function adaptPredictionRate(data) {
+    if (!data.suggested_interval_ms) return;
+    const wanted = Math.max(BASE_PREDICTION_DELAY, data.suggested_interval_ms);
+    if (wanted === predictionDelay) return;
+    predictionDelay = wanted;
+    if (predictionInterval) {
+        clearInterval(predictionInterval);
+        predictionInterval = setInterval(predictionTick, predictionDelay);
+    }
+}
+
+function showPrediction(data) {
+    adaptPredictionRate(data);
+    adaptCropSize(data);
+    if (data.status === 'rate_limited' || data.status === 'dropped') {
+        return; // keep showing the last caption, the next frame will catch up
+    }
+    if (data.status === 'success') {
+        const displayText = data.prediction === '-' ? 
+            'No gesture detected' : 
+            `✋ ${data.prediction} (${data.confidence})`;
+        captionDisplay.textContent = displayText;
+        speakText(data.prediction); // 🔊 Voice here
+    } else {
+        captionDisplay.textContent = "Detection error";
+    }
+}
+
+// Client-side hand detection (MediaPipe JS)
+// Starts at the default model input size; every response reports the size of
+// the model currently serving, so a hot-swap is followed from the next frame
+let cropSize = 160;
+const cropCanvas = document.createElement('canvas');
+cropCanvas.width = cropSize;
+cropCanvas.height = cropSize;
+
+function adaptCropSize(data) {
+    if (!data.input_size || data.input_size[0] === cropSize) return;
+    cropSize = data.input_size[0];
+    cropCanvas.width = cropSize;
+    cropCanvas.height = cropSize;
+}
+let clientHands = null;
+let handsBusy = false;
+
+function initClientHands() {
+    if (typeof Hands === 'undefined') {
+        console.warn("MediaPipe Hands not available, falling back to server-side detection");
+        return;
+    }
+    clientHands = new Hands({
+        locateFile: (file) => `https://cdn.jsdelivr.net/npm/@mediapipe/hands/${file}`
+    });
+    clientHands.setOptions({
+        maxNumHands: 1,
+        modelComplexity: 0,
+        minDetectionConfidence: 0.5,
+        minTrackingConfidence: 0.5
+    });
+    clientHands.onResults(onHandResults);
+}
+
+function onHandResults(results) {
+    if (!results.multiHandLandmarks || results.multiHandLandmarks.length === 0) {
+        // Nothing to classify, no need to bother the server
+        showPrediction({ status: 'success', prediction: '-', confidence: '0.00' });
+        return;
+    }
+    
+    const landmarks = results.multiHandLandmarks[0];
+    const w = localVideo.videoWidth;
+    const h = localVideo.videoHeight;
+    const xs = landmarks.map(lm => lm.x * w);
+    const ys = landmarks.map(lm => lm.y * h);
+    let xMin = Math.min(...xs), xMax = Math.max(...xs);
+    let yMin = Math.min(...ys), yMax = Math.max(...ys);
+    
+    // Same 20% padding as the server-side crop
+    const padX = 0.2 * (xMax - xMin);
+    const padY = 0.2 * (yMax - yMin);
+    xMin = Math.max(0, xMin - padX);
+    yMin = Math.max(0, yMin - padY);
+    xMax = Math.min(w, xMax + padX);
+    yMax = Math.min(h, yMax + padY);
+    if (xMax - xMin < 1 || yMax - yMin < 1) return;
+    
+    const ctx = cropCanvas.getContext('2d');
+    ctx.drawImage(localVideo, xMin, yMin, xMax - xMin, yMax - yMin, 0, 0, cropSize, cropSize);
+    cropCanvas.toBlob(async (blob) => {
+        if (!blob) return;
+        socket.emit('predict_crop', {
+            image: await blob.arrayBuffer(),
+            landmarks: landmarks.map(lm => [lm.x, lm.y, lm.z]),
+            // Hand size in video pixels, the server's quality gate can't see it after the resize
+            box_size: Math.min(xMax - xMin, yMax - yMin)
+        });
+    }, 'image/jpeg', 0.85);
 }
 
 function stopASLPrediction() {
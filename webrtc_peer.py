@@ -0,0 +1,345 @@
+"""WebRTC media path between two desktop clients.
+
+Signaling rides on the web app's Socket.IO room events: one side sends
+create_room, the other join_room, and when participant_joined arrives the
+peer already in the room sends an SDP offer through the 'signal' relay.
+aiortc gathers its ICE candidates before producing a description, so the
+offer and the answer are the only messages needed.
+
+Networking and codecs run on an asyncio loop in a worker thread. Decoded
+remote frames are handed to a second worker, which converts them, runs
+optional ASL recognition and leaves the newest result in a one-slot mailbox
+for the GUI timer to pick up. Nothing here blocks the GUI thread, and if
+recognition falls behind, stale frames are skipped instead of queued.
+
+Loopback check (two peers in one process, against a running web app):
+    python webrtc_peer.py --server http://localhost:8080 --seconds 15
+"""
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import socketio
+from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
+from aiortc.mediastreams import MediaStreamError
+from av import VideoFrame
+
+from inference_client import DaemonConnection, draw_hand
+
+SIGNALING_URL = os.environ.get('BEABLED_SIGNALING_URL', 'http://localhost:8080')
+
+logger = logging.getLogger(__name__)
+
+
+class LatestFrame:
+    """One-slot mailbox: put() overwrites, take() returns the newest item or None"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.overwritten = 0
+
+    def put(self, item):
+        with self.cond:
+            if self.item is not None:
+                self.overwritten += 1
+            self.item = item
+            self.cond.notify()
+
+    def take(self, timeout=None):
+        """With a timeout, waits up to that long for an item to arrive"""
+        with self.cond:
+            if self.item is None and timeout:
+                self.cond.wait(timeout)
+            item, self.item = self.item, None
+        return item
+
+
+class LocalVideoTrack(VideoStreamTrack):
+    """Sends whatever frame the GUI pushed last, paced by aiortc at 30 fps"""
+
+    def __init__(self):
+        super().__init__()
+        self.frame = np.zeros((480, 640, 3), np.uint8)
+
+    def push(self, frame):
+        self.frame = frame  # reference swap, safe from the GUI thread
+
+    async def recv(self):
+        pts, time_base = await self.next_timestamp()
+        video_frame = VideoFrame.from_ndarray(self.frame, format='bgr24')
+        video_frame.pts = pts
+        video_frame.time_base = time_base
+        return video_frame
+
+
+class RemoteASL:
+    """ASL for the remote feed, kept apart from the local pipeline.
+
+    Uses its own inference daemon connection when the daemon is running (so
+    it gets its own Hands graph), otherwise a HeadlessASL in this process.
+    If neither works, `on_unavailable(error)` is called and `available` turns
+    False.
+    """
+
+    def __init__(self, on_unavailable=None):
+        self.asl = None
+        self.daemon = DaemonConnection(self.load_in_process, on_unavailable=on_unavailable)
+
+    @property
+    def available(self):
+        return self.daemon.available
+
+    def load_in_process(self):
+        from asl_pipeline import HeadlessASL
+        self.asl = HeadlessASL()
+
+    def __call__(self, frame):
+        """Annotates the BGR frame in place and returns the recognised label or None"""
+        if not self.daemon.remote:
+            return self.asl.process_frame(frame)[0] if self.asl is not None else None
+        hands = self.daemon.process_frame(frame)
+        label = None
+        for hand in hands or ():
+            if hand['rejected']:
+                continue
+            draw_hand(frame, hand['landmarks'])
+            label = hand['label'] or label
+        return label
+
+    def close(self):
+        if self.daemon.remote:
+            self.daemon.close()
+        elif self.asl is not None:
+            self.asl.close()
+
+
+class RemotePeer:
+    """One-to-one WebRTC call driven from a GUI timer.
+
+    start() joins `room_id` or, without one, creates a room (see .room_id
+    once .ready is set). The GUI calls send() with each local frame and
+    latest() for the newest remote frame as RGB, ready for a QImage. Set
+    asl_enabled to run recognition on the remote feed; if it can't load,
+    asl_error says why and frames keep coming without labels.
+    """
+
+    def __init__(self, server_url=SIGNALING_URL, room_id=None):
+        self.server_url = server_url
+        self.room_id = room_id
+        self.asl_enabled = False
+        self.asl_error = None
+        self.error = None
+        self.state = 'new'
+        self.ready = threading.Event()
+        self.local_track = LocalVideoTrack()
+        self.incoming = LatestFrame()
+        self.remote = LatestFrame()
+        self.stats = {'received': 0, 'processed': 0, 'recognised': 0}
+        self.peer_sid = None
+        self.loop = asyncio.new_event_loop()
+        self.closed = None  # asyncio.Event, created on the loop by _main
+        self.running = True
+        self.network_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.decode_thread = threading.Thread(target=self._process_remote, daemon=True)
+
+    def start(self):
+        self.network_thread.start()
+        self.decode_thread.start()
+        return self
+
+    def send(self, frame):
+        """Queue a local BGR frame; the caller must not modify it afterwards"""
+        self.local_track.push(frame)
+
+    def latest(self):
+        """(rgb_frame, label) for the newest remote frame, or None if nothing new"""
+        return self.remote.take()
+
+    def close(self):
+        self.running = False
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self._stop)
+        self.network_thread.join(timeout=5)
+        self.decode_thread.join(timeout=5)
+
+    # Network thread
+
+    def _stop(self):
+        if self.closed is not None:
+            self.closed.set()  # otherwise _main sees running is False once it creates it
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"WebRTC peer failed: {e}")
+        finally:
+            self.ready.set()
+            self.loop.close()
+
+    async def _main(self):
+        self.closed = asyncio.Event()
+        if not self.running:  # close() came before the loop got here
+            self.closed.set()
+        self.pc = RTCPeerConnection()
+        self.pc.addTrack(self.local_track)
+        self.sio = socketio.AsyncClient()
+
+        @self.pc.on('track')
+        def on_track(track):
+            if track.kind == 'video':
+                asyncio.ensure_future(self._receive(track))
+
+        @self.pc.on('connectionstatechange')
+        async def on_connection_state():
+            self.state = self.pc.connectionState
+            logger.info(f"WebRTC connection {self.state}")
+            if self.state == 'failed':
+                self.error = "peer connection failed"
+
+        @self.sio.on('room_created')
+        async def on_room_created(data):
+            self.room_id = data['room_id']
+            self.ready.set()
+
+        @self.sio.on('participant_joined')
+        async def on_participant_joined(data):
+            if data['sid'] == self.sio.get_sid():
+                self.ready.set()  # our own join, echoed back to the room
+            elif self.peer_sid is None:
+                self.peer_sid = data['sid']
+                await self.pc.setLocalDescription(await self.pc.createOffer())
+                await self._signal(self.pc.localDescription)
+
+        @self.sio.on('signal')
+        async def on_signal(data):
+            if self.peer_sid not in (None, data['from']):
+                return  # one-to-one calls only
+            self.peer_sid = data['from']
+            await self.pc.setRemoteDescription(RTCSessionDescription(sdp=data['sdp'], type=data['type']))
+            if data['type'] == 'offer':
+                await self.pc.setLocalDescription(await self.pc.createAnswer())
+                await self._signal(self.pc.localDescription)
+
+        @self.sio.on('error')
+        async def on_error(data):
+            self.error = data.get('message', 'signaling error')
+            self.ready.set()
+
+        await self.sio.connect(self.server_url)
+        if self.room_id:
+            await self.sio.emit('join_room', {'room_id': self.room_id})
+        else:
+            await self.sio.emit('create_room')
+        try:
+            await self.closed.wait()
+        finally:
+            if self.room_id:
+                await self.sio.emit('leave_room', {'room_id': self.room_id})
+            await self.pc.close()
+            await self.sio.disconnect()
+
+    async def _signal(self, description):
+        await self.sio.emit('signal', {'room': self.room_id, 'type': description.type,
+                                       'sdp': description.sdp})
+
+    async def _receive(self, track):
+        """aiortc decodes on its own thread; this only moves frames off the loop"""
+        while True:
+            try:
+                frame = await track.recv()
+            except MediaStreamError:
+                break
+            self.stats['received'] += 1
+            self.incoming.put(frame)
+
+    # Decode thread
+
+    def _asl_unavailable(self, error):
+        """Recognition can't run here: keep forwarding the remote feed without labels"""
+        self.asl_error = str(error)  # not .error: the GUIs hang up on that
+        logger.error(f"ASL unavailable on the remote feed: {error}")
+        self.asl_enabled = False
+
+    def _process_remote(self):
+        recognise = None
+        while self.running:
+            frame = self.incoming.take(timeout=0.1)
+            if frame is None:
+                continue
+            image = frame.to_ndarray(format='bgr24')
+            label = None
+            if self.asl_enabled:
+                if recognise is None:
+                    recognise = RemoteASL(self._asl_unavailable)  # loads lazily, off the GUI thread
+                if recognise.available:
+                    label = recognise(image)
+                if label:
+                    self.stats['recognised'] += 1
+                    cv2.putText(image, label, (10, 40), cv2.FONT_HERSHEY_SIMPLEX,
+                                1.2, (0, 255, 0), 2, cv2.LINE_AA)
+            self.stats['processed'] += 1
+            self.remote.put((cv2.cvtColor(image, cv2.COLOR_BGR2RGB), label))
+        if recognise is not None:
+            recognise.close()
+
+
+def _test_pattern(t, w=640, h=480):
+    frame = np.zeros((h, w, 3), np.uint8)
+    x = int((t * 200) % w)
+    cv2.rectangle(frame, (x, h // 3), (min(x + 80, w - 1), 2 * h // 3), (0, 200, 255), -1)
+    cv2.putText(frame, f"{t:.2f}s", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connect two local WebRTC peers over loopback")
+    parser.add_argument('--server', default=SIGNALING_URL)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--asl', action='store_true', help="run ASL on what each peer receives")
+    parser.add_argument('--show', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    caller = RemotePeer(args.server).start()
+    if not caller.ready.wait(10) or caller.error:
+        raise SystemExit(f"Could not create a room on {args.server}: {caller.error}")
+    callee = RemotePeer(args.server, room_id=caller.room_id).start()
+    print(f"📞 Loopback call in room {caller.room_id}")
+
+    peers = {'caller': caller, 'callee': callee}
+    for peer in peers.values():
+        peer.asl_enabled = args.asl
+    received = {name: 0 for name in peers}
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds:
+        t = time.perf_counter() - start
+        for name, peer in peers.items():
+            peer.send(_test_pattern(t))
+            item = peer.latest()
+            if item is not None:
+                received[name] += 1
+                if args.show:
+                    cv2.imshow(name, cv2.cvtColor(item[0], cv2.COLOR_RGB2BGR))
+        if args.show:
+            cv2.waitKey(1)
+        time.sleep(1 / 30)
+
+    elapsed = time.perf_counter() - start
+    for name, peer in peers.items():
+        print(f"  {name}: {peer.state}, {received[name] / elapsed:.1f} fps shown, "
+              f"{peer.stats}, {peer.incoming.overwritten} skipped before decode")
+        peer.close()
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()